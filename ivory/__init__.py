@@ -17,3 +17,5 @@
 """
 Ivory: A chess engine in python
 """
+
+__version__ = '0.1'
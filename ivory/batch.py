@@ -0,0 +1,233 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+try:
+    import numpy
+except ImportError:
+    # NOTE: numpy is only needed for batch work over large sets of
+    #       positions, so the rest of the engine runs without it.
+    numpy = None
+
+from ivory import piece
+from ivory import square
+
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_A = square.NOT_FIRST_FILE & FULL
+NOT_H = square.NOT_LAST_FILE & FULL
+NOT_AB = square.NOT_FIRST_TWO_FILES & FULL
+NOT_GH = square.NOT_LAST_TWO_FILES & FULL
+# NOTE: a step is the mask applied to the source squares followed by the
+#       shift, positive for left. Every step is one to one, so counting
+#       the bits after each step counts moves rather than squares.
+ROOK_STEPS = ((FULL, 8), (FULL, -8), (NOT_H, 1), (NOT_A, -1))
+BISHOP_STEPS = ((NOT_H, 9), (NOT_A, 7), (NOT_H, -7), (NOT_A, -9))
+KING_STEPS = ROOK_STEPS + BISHOP_STEPS
+KNIGHT_STEPS = ((NOT_H, 17), (NOT_A, 15), (NOT_GH, 10), (NOT_AB, 6),
+                (NOT_H, -15), (NOT_A, -17), (NOT_GH, -6), (NOT_AB, -10))
+SLIDER_STEPS = {
+    piece.BISHOP: BISHOP_STEPS,
+    piece.ROOK: ROOK_STEPS,
+    piece.QUEEN: KING_STEPS,
+}
+M1 = 0x5555555555555555
+M2 = 0x3333333333333333
+M4 = 0x0F0F0F0F0F0F0F0F
+H01 = 0x0101010101010101
+
+
+def _require():
+    if numpy is None:
+        raise ImportError("numpy is required for batch boards")
+
+
+def _u(val):
+    return numpy.uint64(val)
+
+
+def _shift(bbs, shift):
+    if shift > 0:
+        return bbs << _u(shift)
+    return bbs >> _u(-shift)
+
+
+def _step(bbs, mask, shift):
+    return _shift(bbs & _u(mask), shift)
+
+
+def _steps(bbs, steps):
+    out = numpy.zeros_like(bbs)
+    for mask, shift in steps:
+        out |= _step(bbs, mask, shift)
+    return out
+
+
+def _ray(sliders, empty, mask, shift):
+    # NOTE: kogge-stone occluded fill, the slid squares are stopped by
+    #       the first blocker which is then included by the final step
+    pro = empty & _step(numpy.full_like(empty, FULL), mask, shift)
+    sliders = sliders | (pro & _shift(sliders, shift))
+    pro &= _shift(pro, shift)
+    sliders |= pro & _shift(sliders, shift * 2)
+    pro &= _shift(pro, shift * 2)
+    sliders |= pro & _shift(sliders, shift * 4)
+    return _step(sliders, mask, shift)
+
+
+def popcount(bbs):
+    bbs = numpy.asarray(bbs, dtype=numpy.uint64)
+    bbs = bbs - ((bbs >> _u(1)) & _u(M1))
+    bbs = (bbs & _u(M2)) + ((bbs >> _u(2)) & _u(M2))
+    bbs = (bbs + (bbs >> _u(4))) & _u(M4)
+    return ((bbs * _u(H01)) >> _u(56)).astype(numpy.int64)
+
+
+def n(bbs):
+    return bbs << _u(8)
+
+
+def s(bbs):
+    return bbs >> _u(8)
+
+
+def e(bbs):
+    return _step(bbs, NOT_H, 1)
+
+
+def w(bbs):
+    return _step(bbs, NOT_A, -1)
+
+
+def ne(bbs):
+    return _step(bbs, NOT_H, 9)
+
+
+def nw(bbs):
+    return _step(bbs, NOT_A, 7)
+
+
+def se(bbs):
+    return _step(bbs, NOT_H, -7)
+
+
+def sw(bbs):
+    return _step(bbs, NOT_A, -9)
+
+
+def north_fill(bbs):
+    bbs = bbs | (bbs << _u(8))
+    bbs |= bbs << _u(16)
+    return bbs | (bbs << _u(32))
+
+
+def south_fill(bbs):
+    bbs = bbs | (bbs >> _u(8))
+    bbs |= bbs >> _u(16)
+    return bbs | (bbs >> _u(32))
+
+
+def knight_fill(bbs):
+    return _steps(bbs, KNIGHT_STEPS)
+
+
+def king_fill(bbs):
+    return _steps(bbs, KING_STEPS)
+
+
+def slider_fill(pc, bbs, occupied):
+    empty = ~occupied
+    out = numpy.zeros_like(bbs)
+    for mask, shift in SLIDER_STEPS[pc]:
+        out |= _ray(bbs, empty, mask, shift)
+    return out
+
+
+class BatchBoard(object):
+    # NOTE: pieces[pc] and colors[cl] are uint64 arrays with one entry
+    #       per position, indexed the same way as Position.piece_bbs
+    #       and Position.color_bbs
+    def __init__(self, size):
+        _require()
+        self.pieces = numpy.zeros((piece.KING + 1, size), dtype=numpy.uint64)
+        self.colors = numpy.zeros((2, size), dtype=numpy.uint64)
+        self.color = numpy.zeros(size, dtype=numpy.uint8)
+
+    @classmethod
+    def from_positions(cls, positions):
+        _require()
+        rows = [pos.piece_bbs + pos.color_bbs + [pos.color]
+                for pos in positions]
+        data = numpy.array(rows, dtype=numpy.uint64).reshape(-1, 10).T
+        batch = cls(data.shape[1])
+        batch.pieces[:] = data[:piece.KING + 1]
+        batch.colors[:] = data[piece.KING + 1:piece.KING + 3]
+        batch.color[:] = data[-1]
+        return batch
+
+    def __len__(self):
+        return self.color.shape[0]
+
+    @property
+    def occupied(self):
+        return self.colors[0] | self.colors[1]
+
+    def get(self, cl, pc):
+        return self.pieces[pc] & self.colors[cl]
+
+    def pawn_attacks(self, cl):
+        pawns = self.get(cl, piece.PAWN)
+        if cl:
+            return ne(pawns) | nw(pawns)
+        return se(pawns) | sw(pawns)
+
+    def pawn_attack_spans(self, cl):
+        # NOTE: every square a pawn could attack as it advances
+        pawns = self.get(cl, piece.PAWN)
+        if cl:
+            front = n(north_fill(pawns))
+        else:
+            front = s(south_fill(pawns))
+        return e(front) | w(front)
+
+    def attacks(self, cl, pc):
+        if pc == piece.PAWN:
+            return self.pawn_attacks(cl)
+        pieces = self.get(cl, pc)
+        if pc == piece.KNIGHT:
+            return knight_fill(pieces)
+        if pc == piece.KING:
+            return king_fill(pieces)
+        return slider_fill(pc, pieces, self.occupied)
+
+    def mobility(self, cl, pc):
+        # NOTE: pseudo legal moves to squares not holding an own piece,
+        #       summed over all pieces of the type. Along any one step
+        #       each target has a single attacker, so counting the steps
+        #       separately gives exact per-piece totals.
+        if pc == piece.PAWN:
+            raise ValueError("pawn mobility is not a fill")
+        pieces = self.get(cl, pc)
+        target = ~self.colors[cl]
+        out = numpy.zeros(len(self), dtype=numpy.int64)
+        if pc in SLIDER_STEPS:
+            empty = ~self.occupied
+            for mask, shift in SLIDER_STEPS[pc]:
+                out += popcount(_ray(pieces, empty, mask, shift) & target)
+            return out
+        steps = KNIGHT_STEPS if pc == piece.KNIGHT else KING_STEPS
+        for mask, shift in steps:
+            out += popcount(_step(pieces, mask, shift) & target)
+        return out
@@ -0,0 +1,226 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+import ivory
+from ivory import bitboard
+from ivory import position
+
+
+POSITIONS = [
+    ('start',
+     'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ('kiwipete',
+     'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603, 193690690]),
+    ('position3',
+     '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ('position4',
+     'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333, 15833292]),
+    ('position5',
+     'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487, 89941194]),
+    ('position6',
+     'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 '
+     '10',
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+NAMES = [name for name, fen, counts in POSITIONS]
+COLUMNS = [('Position', 10), ('Depth', 5), ('Nodes', 10), ('Expected', 10),
+           ('Time', 9), ('Nodes/s', 9), ('Captures', 8), ('E.p.', 5),
+           ('Checks', 7), ('Mates', 5), ('Promotions', 10), ('Castles', 7)]
+
+# NOTE: the de bruijn helpers bitboard used before switching to
+#       bit_length, kept so the micro benchmark can compare against them
+BS_INDEX = [
+        0, 47,  1, 56, 48, 27,  2, 60,
+       57, 49, 41, 37, 28, 16,  3, 61,
+       54, 58, 35, 52, 50, 42, 21, 44,
+       38, 32, 29, 23, 17, 11,  4, 62,
+       46, 55, 26, 59, 40, 36, 15, 53,
+       34, 51, 20, 43, 31, 22, 10, 45,
+       25, 39, 14, 33, 19, 30,  9, 24,
+       13, 18,  8, 12,  7,  6,  5, 63
+]
+DEBRUIJIN = 0x03f79d71b4cb0a89L
+
+
+def _debruijn_lsb(bb):
+    xored = bb ^ (bb - 1)
+    return BS_INDEX[((xored * DEBRUIJIN) >> 58) & 0x3F]
+
+
+def _debruijn_msb(bb):
+    bb |= bb >> 1
+    bb |= bb >> 2
+    bb |= bb >> 4
+    bb |= bb >> 8
+    bb |= bb >> 16
+    bb |= bb >> 32
+    return BS_INDEX[((bb * DEBRUIJIN) >> 58) & 0x3F]
+
+
+def _debruijn_squares(bb):
+    while bb:
+        yield _debruijn_lsb(bb)
+        bb &= bb - 1
+
+
+def _debruijn_ones(bb):
+    return sum(1 for sq in _debruijn_squares(bb))
+
+
+MICRO = [
+    ('lsb', _debruijn_lsb, bitboard.lsb),
+    ('msb', _debruijn_msb, bitboard.msb),
+    ('squares', lambda bb: list(_debruijn_squares(bb)), bitboard.squares),
+    ('ones', _debruijn_ones, bitboard.ones),
+]
+
+
+def _micro_boards():
+    boards = set()
+    for name, fen, counts in POSITIONS:
+        pos = position.Position(fen)
+        boards.update(pos.piece_bbs + pos.color_bbs + [pos.occupied])
+    boards.discard(0)
+    return sorted(boards)
+
+
+def micro(number=1000):
+    boards = _micro_boards()
+    results = []
+    for name, old, new in MICRO:
+        timings = []
+        for func in (old, new):
+            start = time.time()
+            for i in xrange(number):
+                for bb in boards:
+                    func(bb)
+            timings.append(time.time() - start)
+        results.append({
+            'function': name,
+            'calls': number * len(boards),
+            'old': timings[0],
+            'new': timings[1],
+            'ok': [old(bb) for bb in boards] == [new(bb) for bb in boards],
+        })
+    return results
+
+
+def run(name, fen, counts, depth, hash_mb=None, workers=None):
+    pos = position.Position(fen)
+    pos.zero_stats()
+    start = time.time()
+    if workers:
+        nodes = sum(pos.perft_divide(depth, workers=workers).values())
+    else:
+        nodes = pos.perft(depth, hash_mb=hash_mb)
+    elapsed = time.time() - start
+    result = {
+        'position': name,
+        'fen': fen,
+        'depth': depth,
+        'nodes': nodes,
+        'expected': counts[depth - 1],
+        'ok': nodes == counts[depth - 1],
+        'seconds': elapsed,
+        'nps': nodes / elapsed if elapsed else None,
+    }
+    # NOTE: hashed perft skips transposed leaves, so its stats are partial
+    if not hash_mb:
+        result['stats'] = dict(zip(position.Position.STATS, pos.stats))
+    return result
+
+
+def _format(result):
+    stats = result.get('stats', {})
+    row = [result['position'], result['depth'], result['nodes'],
+           result['expected'], '%.3f' % result['seconds'],
+           '%d' % (result['nps'] or 0)]
+    row.extend(stats.get(stat, '-') for stat in position.Position.STATS)
+    out = '  '.join('%-*s' % (width, val)
+                    for (title, width), val in zip(COLUMNS, row))
+    if not result['ok']:
+        out += '  MISMATCH'
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ivory.bench',
+        description='Run perft on the standard test positions.')
+    parser.add_argument('-d', '--depth', type=int, default=3,
+                        help='deepest perft to run for each position')
+    parser.add_argument('-p', '--position', action='append', choices=NAMES,
+                        help='position to run (default: all)')
+    parser.add_argument('--hash-mb', type=int, default=None,
+                        help='use a perft hash table of this many MB')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='split each perft over this many processes')
+    parser.add_argument('-o', '--json', metavar='FILE',
+                        help='write the results as JSON to FILE')
+    parser.add_argument('--micro', type=int, metavar='N', default=None,
+                        help='time the bitboard helpers N times over instead')
+    args = parser.parse_args(argv)
+
+    if args.micro:
+        results = micro(args.micro)
+        print '%-10s%-10s%-10s%-10s%s' % ('Function', 'Calls', 'Old', 'New',
+                                          'Speedup')
+        for result in results:
+            print '%-10s%-10d%-10.3f%-10.3f%.1fx%s' % (
+                result['function'], result['calls'], result['old'],
+                result['new'], result['old'] / (result['new'] or 1e-9),
+                '' if result['ok'] else '  MISMATCH')
+        return 0 if all(result['ok'] for result in results) else 1
+
+    print '  '.join('%-*s' % (width, title) for title, width in COLUMNS)
+    results = []
+    for name, fen, counts in POSITIONS:
+        if args.position and name not in args.position:
+            continue
+        for depth in xrange(1, min(args.depth, len(counts)) + 1):
+            result = run(name, fen, counts, depth, args.hash_mb, args.workers)
+            results.append(result)
+            print _format(result)
+            sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'version': ivory.__version__,
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'time': time.time(),
+                'hash_mb': args.hash_mb,
+                'workers': args.workers,
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
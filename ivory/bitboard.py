@@ -15,56 +15,58 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from array import array
+
 from ivory import square
 
 BITS = '01'
 NONE = 0L
 BITS_TO_INT = dict(zip(BITS, xrange(len(BITS))))
-BS_INDEX = [
-        0, 47,  1, 56, 48, 27,  2, 60,
-       57, 49, 41, 37, 28, 16,  3, 61,
-       54, 58, 35, 52, 50, 42, 21, 44,
-       38, 32, 29, 23, 17, 11,  4, 62,
-       46, 55, 26, 59, 40, 36, 15, 53,
-       34, 51, 20, 43, 31, 22, 10, 45,
-       25, 39, 14, 33, 19, 30,  9, 24,
-       13, 18,  8, 12,  7,  6,  5, 63
-]
-BS_SQUARES = [square.INTS[i] for i in BS_INDEX]
-DEBRUIJIN = 0x03f79d71b4cb0a89L
+# NOTE: bit counts of every 16 bit value, so a popcount is four lookups
+POPCOUNT = [bin(i).count('1') for i in xrange(1 << 16)]
+# NOTE: python 2 has no 'Q' typecode, and unsigned long is only 64 bits
+#       on LP64 platforms. Elsewhere (windows, 32 bit builds) words falls
+#       back to a plain list.
+TYPECODE = None
+for code in ('Q', 'L'):
+    try:
+        if array(code).itemsize == 8:
+            TYPECODE = code
+            break
+    except ValueError:
+        pass
+
+
+def words(size):
+    # NOTE: a zeroed, indexable block of 64 bit words
+    if TYPECODE is None:
+        return [0L] * size
+    return array(TYPECODE, [0]) * size
 
 
 def lsb(bb):
-    # NOTE(vish): This is inneficient with python longs. Switching
-    #             to numpy.long should speed it up and enable the
-    #             removal of the & 0x3F.
-    xored = bb ^ (bb - 1)
-    return BS_SQUARES[((xored * DEBRUIJIN) >> 58) & 0x3F]
+    return (bb & -bb).bit_length() - 1
 
 
 def msb(bb):
-    bb = bb
-    bb |= bb >> 1
-    bb |= bb >> 2
-    bb |= bb >> 4
-    bb |= bb >> 8
-    bb |= bb >> 16
-    bb |= bb >> 32
-    # NOTE(vish): This is inneficient with python longs. Switching
-    #             to numpy.long should speed it up and enable the
-    #             removal of the & 0x3F.
-    return BS_SQUARES[((bb * DEBRUIJIN) >> 58) & 0x3F]
+    return bb.bit_length() - 1
 
 
 def squares(bb):
+    # NOTE: builds the whole list at once. This beats a generator for the
+    #       sparse sets that movegen loops over and can be indexed.
+    out = []
+    append = out.append
     while bb:
-        sq = lsb(bb)
-        yield sq
-        bb = bb & ~sq
+        low = bb & -bb
+        append(low.bit_length() - 1)
+        bb ^= low
+    return out
 
 
 def ones(bb):
-    return sum(1 for sq in squares(bb))
+    return (POPCOUNT[bb & 0xFFFF] + POPCOUNT[(bb >> 16) & 0xFFFF] +
+            POPCOUNT[(bb >> 32) & 0xFFFF] + POPCOUNT[bb >> 48])
 
 
 def str(bb):
@@ -72,7 +74,7 @@ def str(bb):
     for rank in xrange(8):
         for file in xrange(8):
             sq = square.from_a8(rank, file)
-            out.append(BITS[int(sq & bb != 0)])
+            out.append(BITS[int(square.BITS[sq] & bb != 0)])
         out.append("\n")
     return ''.join(out)
 
@@ -127,5 +129,5 @@ def parse(val):
             ch = val[(7 - rank) * 8 + file]
             if ch not in BITS:
                 raise ValueError("invalid char in bitboard: %s" % sq)
-            out += BITS_TO_INT[ch] * square.from_a8(rank, file)
+            out += BITS_TO_INT[ch] * square.BITS[square.from_a8(rank, file)]
     return out
@@ -0,0 +1,183 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import re
+
+from ivory import position
+
+
+# NOTE: pulls the move clocks out of the operations text without parsing
+#       the rest of it, so loading a suite stays lazy
+CLOCKS = re.compile(r'(?:^|;)\s*(hmvc|fmvn)\s+(\d+)\s*(?=;|$)')
+QUOTED = re.compile(r'"[^"]*"')
+
+def _split_operations(text):
+    # NOTE: operations are "opcode operand ...;" with string operands in
+    #       double quotes, which may contain spaces and semicolons
+    operations = []
+    tokens = []
+    token = []
+    quoted = False
+    for char in text:
+        if quoted:
+            if char == '"':
+                quoted = False
+                tokens.append(''.join(token))
+                token = []
+            else:
+                token.append(char)
+        elif char == '"':
+            quoted = True
+        elif char == ';' or char.isspace():
+            if token:
+                tokens.append(''.join(token))
+                token = []
+            if char == ';' and tokens:
+                operations.append((tokens[0], tokens[1:]))
+                tokens = []
+        else:
+            token.append(char)
+    if quoted:
+        raise ValueError('unterminated string in epd operations')
+    if token:
+        tokens.append(''.join(token))
+    if tokens:
+        operations.append((tokens[0], tokens[1:]))
+    return operations
+
+
+class Record(object):
+    # NOTE: a record only splits off the four position fields up front.
+    #       Operations are parsed the first time they are asked for.
+    __slots__ = ('fields', 'text', '_operations')
+
+    def __init__(self, line):
+        fields = line.split(None, 4)
+        if len(fields) < 4:
+            raise ValueError('epd needs at least four fields')
+        self.fields = fields[:4]
+        self.text = fields[4] if len(fields) > 4 else ''
+        self._operations = None
+
+    def __repr__(self):
+        return "(%r)" % self.line
+
+    @property
+    def line(self):
+        if self.text:
+            return ' '.join(self.fields) + ' ' + self.text
+        return ' '.join(self.fields)
+
+    @property
+    def operations(self):
+        if self._operations is None:
+            self._operations = dict(_split_operations(self.text))
+        return self._operations
+
+    def get(self, opcode, default=None):
+        operands = self.operations.get(opcode)
+        if not operands:
+            return default
+        return operands[0] if len(operands) == 1 else operands
+
+    @property
+    def fen(self):
+        clock, move_num = '0', '1'
+        text = self.text
+        if 'hmvc' in text or 'fmvn' in text:
+            if '"' in text:
+                # NOTE: an unterminated string makes the operations
+                #       malformed, so the clocks keep their defaults
+                if text.count('"') % 2:
+                    text = ''
+                text = QUOTED.sub('""', text)
+            clocks = dict(CLOCKS.findall(text))
+            clock = clocks.get('hmvc', clock)
+            move_num = clocks.get('fmvn', move_num)
+        return '%s %s %s' % (' '.join(self.fields), clock, move_num)
+
+    @property
+    def id(self):
+        return self.get('id')
+
+    @property
+    def best_moves(self):
+        return self.operations.get('bm', [])
+
+    @property
+    def avoid_moves(self):
+        return self.operations.get('am', [])
+
+    @property
+    def perft(self):
+        # NOTE: perft suites write their counts as "D1 20; D2 400; ..."
+        counts = {}
+        for opcode, operands in self.operations.iteritems():
+            if opcode[:1] == 'D' and opcode[1:].isdigit() and operands:
+                counts[int(opcode[1:])] = int(operands[0])
+        return counts
+
+
+def read(lines):
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield Record(line)
+
+
+def load(lines, pos=None):
+    # NOTE: the same position is updated in place for every record, so
+    #       callers must copy it if they want to keep it
+    if pos is None:
+        pos = position.Position()
+    for record in read(lines):
+        pos.fen = record.fen
+        yield pos, record
+
+
+def _format_operand(operand):
+    operand = str(operand)
+    if not operand or '"' in operand:
+        raise ValueError('bad epd operand: %r' % operand)
+    if ' ' in operand or ';' in operand:
+        return '"%s"' % operand
+    return operand
+
+
+def format(pos, operations=()):
+    fields = pos.fen.split()
+    parts = [' '.join(fields[:4])]
+    if hasattr(operations, 'items'):
+        operations = sorted(operations.items())
+    for opcode, operands in operations:
+        if isinstance(operands, basestring) or not hasattr(operands,
+                                                           '__iter__'):
+            operands = [operands]
+        parts.append(' '.join([opcode] + [_format_operand(operand)
+                                          for operand in operands]) + ';')
+    return ' '.join(parts)
+
+
+def dump(out, items):
+    # NOTE: items are (position, operations) pairs, and a position may be
+    #       reused between them since each line is written immediately
+    count = 0
+    for pos, operations in items:
+        out.write(format(pos, operations))
+        out.write('\n')
+        count += 1
+    return count
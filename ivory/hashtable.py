@@ -0,0 +1,148 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from array import array
+
+from ivory import bitboard
+
+
+class PerftTable(object):
+    # NOTE: entries live in preallocated parallel arrays grouped into
+    #       buckets. A store reuses the same (key, depth) or an empty slot,
+    #       otherwise it replaces the shallowest entry in the bucket since
+    #       deeper subtrees are the most expensive to recompute.
+    BUCKET = 4
+    ENTRY_SIZE = 8 + 8 + 1
+
+    def __init__(self, hash_mb=16):
+        entries = max(int(hash_mb * (1 << 20)) // self.ENTRY_SIZE, self.BUCKET)
+        buckets = 1
+        while buckets * 2 * self.BUCKET <= entries:
+            buckets *= 2
+        self.mask = buckets - 1
+        size = buckets * self.BUCKET
+        self.keys = bitboard.words(size)
+        self.nodes = bitboard.words(size)
+        # NOTE: depth 0 marks an empty slot, perft never stores it
+        self.depths = array('B', [0]) * size
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def probe(self, key, depth):
+        self.probes += 1
+        start = (key & self.mask) * self.BUCKET
+        for i in xrange(start, start + self.BUCKET):
+            if self.keys[i] == key and self.depths[i] == depth:
+                self.hits += 1
+                return self.nodes[i]
+        return None
+
+    def store(self, key, depth, nodes):
+        self.stores += 1
+        start = (key & self.mask) * self.BUCKET
+        depths = self.depths
+        victim = start
+        for i in xrange(start, start + self.BUCKET):
+            if not depths[i] or (self.keys[i] == key and depths[i] == depth):
+                victim = i
+                break
+            if depths[i] < depths[victim]:
+                victim = i
+        self.keys[victim] = key
+        self.depths[victim] = depth
+        self.nodes[victim] = nodes
+
+    @property
+    def hit_rate(self):
+        return float(self.hits) / self.probes if self.probes else 0.0
+
+    def clear(self):
+        size = len(self.keys)
+        self.keys = bitboard.words(size)
+        self.nodes = bitboard.words(size)
+        self.depths = array('B', [0]) * size
+        self.probes = self.hits = self.stores = 0
+
+
+EXACT, LOWER, UPPER = range(1, 4)
+
+
+class SearchTable(object):
+    # NOTE: same layout as PerftTable, but each entry keeps the best move,
+    #       score and bound found by the search. Depths are stored plus one
+    #       so that zero still marks an empty slot.
+    BUCKET = 2
+    ENTRY_SIZE = 8 + 4 + 4 + 1 + 1
+
+    def __init__(self, hash_mb=16):
+        entries = max(int(hash_mb * (1 << 20)) // self.ENTRY_SIZE, self.BUCKET)
+        buckets = 1
+        while buckets * 2 * self.BUCKET <= entries:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.size = buckets * self.BUCKET
+        self.clear()
+
+    def __len__(self):
+        return self.size
+
+    def probe(self, key):
+        self.probes += 1
+        start = (key & self.mask) * self.BUCKET
+        for i in xrange(start, start + self.BUCKET):
+            if self.keys[i] == key and self.depths[i]:
+                self.hits += 1
+                return (self.moves[i], self.scores[i], self.depths[i] - 1,
+                        self.bounds[i])
+        return None
+
+    def store(self, key, depth, mv, score, bound):
+        self.stores += 1
+        start = (key & self.mask) * self.BUCKET
+        depths = self.depths
+        victim = start
+        for i in xrange(start, start + self.BUCKET):
+            if not depths[i] or self.keys[i] == key:
+                victim = i
+                break
+            if depths[i] < depths[victim]:
+                victim = i
+        if self.keys[victim] == key and not mv:
+            # NOTE: keep the old best move if this search didn't find one
+            mv = self.moves[victim]
+        self.keys[victim] = key
+        self.depths[victim] = depth + 1
+        self.moves[victim] = mv
+        self.scores[victim] = score
+        self.bounds[victim] = bound
+
+    @property
+    def hit_rate(self):
+        return float(self.hits) / self.probes if self.probes else 0.0
+
+    def clear(self):
+        size = self.size
+        self.keys = bitboard.words(size)
+        self.moves = array('I', [0]) * size
+        self.scores = array('i', [0]) * size
+        self.depths = array('B', [0]) * size
+        self.bounds = array('B', [0]) * size
+        self.probes = self.hits = self.stores = 0
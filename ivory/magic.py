@@ -0,0 +1,268 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import ctypes
+import mmap
+import os
+import random
+import struct
+import sys
+import zlib
+
+from ivory import bitboard
+from ivory import piece
+from ivory import square
+
+
+FULL = 0xFFFFFFFFFFFFFFFFL
+DIRECTIONS = {
+    piece.BISHOP: ('ne', 'se', 'sw', 'nw'),
+    piece.ROOK: ('n', 'e', 's', 'w'),
+}
+NAMES = {piece.BISHOP: 'BISHOP', piece.ROOK: 'ROOK'}
+# NOTE: bump VERSION whenever the table layout changes. Changed magics are
+#       caught by the checksum of the magics stored in the header.
+VERSION = 1
+SIGNATURE = 'IVA' + sys.byteorder[0].upper()
+HEADER = struct.Struct('<4sIIIII')
+CACHE_DIR = os.environ.get('IVORY_CACHE_DIR') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+    'ivory')
+
+BISHOP_MAGICS = [
+    0x0508080810a02200L, 0xa824100881031240L, 0x00411c0100418030L,
+    0x2424440880080028L, 0x0854102902000010L, 0x0400821040e80508L,
+    0x0139009004200010L, 0x04010108010108c0L, 0x000241180820c280L,
+    0x00091c0402a20202L, 0x0a00040104190000L, 0x0040242414880300L,
+    0x0010140421208012L, 0x0300011008044000L, 0x0800024110292000L,
+    0x0044a02118021048L, 0x0006091104080800L, 0x0005101004008c00L,
+    0x0108088108010012L, 0x4008000088210000L, 0x0004000600a200d2L,
+    0x0000804410042100L, 0x000600440a020300L, 0x8800400080641040L,
+    0x2008400405048809L, 0x0021a02010041100L, 0x4020480010088813L,
+    0x8080808018020002L, 0x200e002112008040L, 0x20010100080c0102L,
+    0x000800800200a400L, 0x1001182206021100L, 0x010288200140a210L,
+    0x1022080200200280L, 0x8020108802100050L, 0x9001440108440100L,
+    0x21284a0020020080L, 0x2000810100521000L, 0x01c2842040240200L,
+    0x00c82a0241108040L, 0x0048262a20801000L, 0x240c480288003030L,
+    0x002201040201010cL, 0x0001402018000100L, 0x0440082904004040L,
+    0x122014a202800810L, 0x411001064c019090L, 0x125204040091002aL,
+    0x1248841002100000L, 0x1090840401044000L, 0x0420024602410000L,
+    0x0320208205040080L, 0x0202220821010091L, 0x00002404083a1010L,
+    0x1a040404082a0048L, 0x04285002a8a10000L, 0x0100482208200400L,
+    0x04e0004402611006L, 0xc240088100809080L, 0x8040080012104400L,
+    0x0118000020043400L, 0x1000008910011200L, 0x800008100410c400L,
+    0x43400898204040c0L,
+]
+ROOK_MAGICS = [
+    0x4080062210400081L, 0x9540089000600040L, 0x2080200008801000L,
+    0x9080100080040800L, 0x0a00102044020088L, 0x6900440001000208L,
+    0x020008020000c104L, 0x020001060042298cL, 0x8094802440008000L,
+    0x1402400440201008L, 0x0101004100102002L, 0x4445000c20100100L,
+    0x126a002200040810L, 0x8060808004000200L, 0x0003000100040200L,
+    0x229900020040a100L, 0x0100208000400082L, 0x6090104000402003L,
+    0x02c8410018200100L, 0x09e1828010000804L, 0x4019010010040800L,
+    0x0006008002808400L, 0x0010808001000200L, 0x82284a0004008841L,
+    0x0020400880003080L, 0x4068200080400084L, 0x4110200100401100L,
+    0x0010010100082014L, 0x0000040080080080L, 0x9102000200100409L,
+    0x800e121400102801L, 0x000900010000a042L, 0x0c008040028002a0L,
+    0x0004200086804008L, 0x2200822004801001L, 0x00100a0022001040L,
+    0x0a01000801001004L, 0x0000800400800201L, 0x00810004c1000200L,
+    0x200100a042000401L, 0x8140892640008003L, 0x0000201000404001L,
+    0x1000200010008080L, 0x2082000810420022L, 0x0004008040080800L,
+    0x4104000810020200L, 0x1004111082040018L, 0x48100100814e0024L,
+    0x2040248001104100L, 0x0000304000810100L, 0x090c441820010100L,
+    0x4020100081080480L, 0x004e820c00180180L, 0x0880800c00060180L,
+    0x4000028810410400L, 0x0221410044008200L, 0x0840402100108001L,
+    0x0000204002810053L, 0x0001007041486001L, 0x0003000610002009L,
+    0x2282000409201002L, 0x20020070380c0322L, 0x1000500508120884L,
+    0x2006064304240082L,
+]
+
+
+def slide_attacks(pc, sq, occ):
+    result = 0L
+    for dir in DIRECTIONS[pc]:
+        for test in square.walk(sq, dir):
+            result |= square.BITS[test]
+            if square.BITS[test] & occ:
+                break
+    return result
+
+
+def relevant_mask(pc, sq):
+    # NOTE: the last square of each ray never blocks anything, so it is
+    #       left out to keep the tables small.
+    mask = 0L
+    for dir in DIRECTIONS[pc]:
+        ray = list(square.walk(sq, dir))
+        for test in ray[:-1]:
+            mask |= square.BITS[test]
+    return mask
+
+
+def subsets(mask):
+    occ = 0L
+    while True:
+        yield occ
+        occ = (occ - mask) & mask
+        if not occ:
+            break
+
+
+def find_magic(pc, sq, rand=None):
+    if rand is None:
+        rand = random.Random()
+    mask = relevant_mask(pc, sq)
+    bits = bitboard.ones(mask)
+    shift = 64 - bits
+    occs = list(subsets(mask))
+    attacks = [slide_attacks(pc, sq, occ) for occ in occs]
+    while True:
+        magic = (rand.getrandbits(64) & rand.getrandbits(64) &
+                 rand.getrandbits(64))
+        if bitboard.ones(((mask * magic) & FULL) >> 56) < 6:
+            continue
+        used = [None] * (1 << bits)
+        for occ, att in zip(occs, attacks):
+            idx = ((occ * magic) & FULL) >> shift
+            if used[idx] is None:
+                used[idx] = att
+            elif used[idx] != att:
+                break
+        else:
+            return magic
+
+
+def generate(seed=None):
+    rand = random.Random(seed)
+    return dict((pc, [find_magic(pc, sq, rand) for sq in square.all()])
+                for pc in (piece.BISHOP, piece.ROOK))
+
+
+def attacks(pc, sq, occ):
+    return TABLES[pc][OFFSETS[pc][sq] +
+                      ((((occ & MASKS[pc][sq]) * MAGICS[pc][sq])
+                        & FULL) >> SHIFTS[pc][sq])]
+
+
+def build(pc):
+    table = bitboard.words(SIZES[pc])
+    for sq in square.all():
+        mask = MASKS[pc][sq]
+        magic = MAGICS[pc][sq]
+        shift = SHIFTS[pc][sq]
+        offset = OFFSETS[pc][sq]
+        for occ in subsets(mask):
+            idx = offset + (((occ * magic) & FULL) >> shift)
+            table[idx] = slide_attacks(pc, sq, occ)
+    return table
+
+
+def cache_path(pc):
+    if not CACHE_DIR:
+        return None
+    return os.path.join(CACHE_DIR, 'attacks-%s-v%d.bin' %
+                        (NAMES[pc].lower(), VERSION))
+
+
+def _magics_crc(pc):
+    magics = struct.pack('=%dQ' % len(MAGICS[pc]), *MAGICS[pc])
+    return zlib.crc32(magics) & 0xFFFFFFFF
+
+
+def _read(path, pc):
+    try:
+        with open(path, 'rb') as f:
+            # NOTE: a private mapping is writable for ctypes, but its pages
+            #       stay shared with the page cache and every other process
+            #       until something writes to them, which nothing does.
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    except (IOError, OSError, ValueError):
+        return None
+    if len(data) != HEADER.size + SIZES[pc] * 8:
+        return None
+    sig, version, stored_pc, size, magics_crc, crc = HEADER.unpack_from(data)
+    if (sig != SIGNATURE or version != VERSION or stored_pc != pc or
+            size != SIZES[pc] or magics_crc != _magics_crc(pc) or
+            crc != zlib.crc32(data[HEADER.size:]) & 0xFFFFFFFF):
+        return None
+    return (ctypes.c_uint64 * size).from_buffer(data, HEADER.size)
+
+
+def _write(path, pc, table):
+    # NOTE: native order to match the ctypes view _read maps over it
+    payload = struct.pack('=%dQ' % len(table), *table)
+    header = HEADER.pack(SIGNATURE, VERSION, pc, SIZES[pc], _magics_crc(pc),
+                         zlib.crc32(payload) & 0xFFFFFFFF)
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            f.write(payload)
+        os.rename(tmp, path)
+    except (IOError, OSError):
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def load(pc):
+    path = cache_path(pc)
+    if path:
+        table = _read(path, pc)
+        if table is not None:
+            return table
+    table = build(pc)
+    if path:
+        _write(path, pc, table)
+    return table
+
+
+class _Tables(dict):
+    # NOTE: tables are loaded or built the first time a piece type is
+    #       looked up, so importing the module stays cheap.
+    def __missing__(self, pc):
+        table = self[pc] = load(pc)
+        return table
+
+
+MAGICS = {piece.BISHOP: BISHOP_MAGICS, piece.ROOK: ROOK_MAGICS}
+MASKS = {}
+SHIFTS = {}
+OFFSETS = {}
+SIZES = {}
+TABLES = _Tables()
+for pc in (piece.BISHOP, piece.ROOK):
+    MASKS[pc] = [relevant_mask(pc, sq) for sq in square.all()]
+    SHIFTS[pc] = [64 - bitboard.ones(mask) for mask in MASKS[pc]]
+    OFFSETS[pc] = []
+    offset = 0
+    for shift in SHIFTS[pc]:
+        OFFSETS[pc].append(offset)
+        offset += 1 << (64 - shift)
+    SIZES[pc] = offset
+
+
+if __name__ == '__main__':
+    seed = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    for pc, magics in sorted(generate(seed).items()):
+        print '%s_MAGICS = [' % NAMES[pc]
+        for i in xrange(0, 64, 3):
+            row = magics[i:i + 3]
+            print '    %s,' % ', '.join('0x%016xL' % m for m in row)
+        print ']'
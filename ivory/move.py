@@ -35,14 +35,25 @@ PIECE_OFF = 8 + TOSQ_OFF
 PIECE = 0xF << PIECE_OFF
 PROMOTION_OFF = 4 + PIECE_OFF
 PROMOTION = 0xF << PROMOTION_OFF
+SQUARE_NAMES = [square.str(sq) for sq in square.INTS]
+FILE_NAMES = [square.FILES[square.file(sq)] for sq in square.INTS]
+RANK_NAMES = [square.RANKS[square.rank(sq)] for sq in square.INTS]
+# NOTE: indexed by frsq | tosq << 6
+UCI_SQUARES = [frname + toname for toname in SQUARE_NAMES
+               for frname in SQUARE_NAMES]
+# NOTE: indexed by the promotion field, where pawn and king only mark
+#       en passant and castling so they print nothing
+UCI_PROMOTIONS = ['', '', 'n', 'b', 'r', 'q', '']
+UCI_TO_PROMOTION = dict((name, pc) for pc, name in enumerate(UCI_PROMOTIONS)
+                        if name)
+SAN_PIECES = ['', '', 'N', 'B', 'R', 'Q', 'K']
+SAN_PROMOTIONS = ['', '', '=N', '=B', '=R', '=Q', '']
+SAN_CACHE = {}
 
 
 def mv(piece, frsq, tosq, promotion=ivory_piece.NONE):
-    val = piece
-    val = ((square.index(frsq) << FRSQ_OFF) |
-           (square.index(tosq) << TOSQ_OFF) |
-           (piece << PIECE_OFF) | (promotion << PROMOTION_OFF))
-    return val
+    return ((frsq << FRSQ_OFF) | (tosq << TOSQ_OFF) |
+            (piece << PIECE_OFF) | (promotion << PROMOTION_OFF))
 
 
 def is_capture(mv):
@@ -122,44 +133,54 @@ def set_promotion(mv, pc):
 
 
 def frsq(mv):
-    return square.from_index((mv & FRSQ) >> FRSQ_OFF)
+    return (mv & FRSQ) >> FRSQ_OFF
 
 
 def set_frsq(mv, sq):
-    return mv & ~FRSQ | (square.index(sq) << FRSQ_OFF)
+    return mv & ~FRSQ | (sq << FRSQ_OFF)
 
 
 def tosq(mv):
-    return square.from_index((mv & TOSQ) >> TOSQ_OFF)
+    return (mv & TOSQ) >> TOSQ_OFF
 
 
 def set_tosq(mv, sq):
-    return mv & ~TOSQ | (square.index(sq) << TOSQ_OFF)
+    return mv & ~TOSQ | (sq << TOSQ_OFF)
+
+
+def uci(mv):
+    return (UCI_SQUARES[((mv & FRSQ) >> FRSQ_OFF) |
+                        ((mv & TOSQ) >> (TOSQ_OFF - 6))] +
+            UCI_PROMOTIONS[(mv & PROMOTION) >> PROMOTION_OFF])
 
 
 def str(mv):
-    if promotion(mv) == ivory_piece.KING:
-        return 'O-O-O' if square.file(tosq(mv)) == 'c' else 'O-O'
-    out = []
-    if piece(mv) == ivory_piece.PAWN:
-        if is_capture(mv):
-            out.append(square.file(frsq(mv)))
-            out.append('x')
+    # NOTE: the flags are part of the key, so annotated moves are cached
+    #       separately from plain ones
+    try:
+        return SAN_CACHE[mv]
+    except KeyError:
+        pass
+    frsq = (mv & FRSQ) >> FRSQ_OFF
+    prm = (mv & PROMOTION) >> PROMOTION_OFF
+    pc = (mv & PIECE) >> PIECE_OFF
+    if prm == ivory_piece.KING:
+        out = 'O-O-O' if square.FILE[tosq(mv)] == 2 else 'O-O'
+    elif pc == ivory_piece.PAWN:
+        out = FILE_NAMES[frsq] + 'x' if mv & CAPTURE else ''
     else:
-        out.append(ivory_piece.str(piece(mv)).upper())
-        if is_show_file(mv):
-            out.append(square.file(frsq(mv)))
-        if is_show_rank(mv):
-            out.append(square.rank(frsq(mv)))
-        if is_capture(mv):
-            out.append('x')
-    out.append(square.str(tosq(mv)))
-    if promotion(mv):
-        print square.str(frsq(mv)), square.str(tosq(mv))
-        out.append('=')
-        out.append(ivory_piece.str(promotion(mv)).upper())
-    if is_check(mv):
-        out.append('+')
-    if is_mate(mv):
-        out.append('#')
-    return ''.join(out)
+        out = SAN_PIECES[pc]
+        if mv & SHOW_FILE:
+            out += FILE_NAMES[frsq]
+        if mv & SHOW_RANK:
+            out += RANK_NAMES[frsq]
+        if mv & CAPTURE:
+            out += 'x'
+    if prm != ivory_piece.KING:
+        out += SQUARE_NAMES[tosq(mv)] + SAN_PROMOTIONS[prm]
+    if mv & MATE:
+        out += '#'
+    elif mv & CHECK:
+        out += '+'
+    SAN_CACHE[mv] = out
+    return out
@@ -14,11 +14,9 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
-import os
-import cPickle as pickle
-
 from ivory import bitboard
 from ivory import castle
+from ivory import magic
 from ivory import move
 from ivory import piece
 from ivory import square
@@ -33,98 +31,98 @@ def get_pawn_moves(pos, moves):
     pawns = pos.piece_bbs[piece.PAWN] & pos.color_bbs[pos.color]
     not_occ = ~(pos.occupied)
     enp = pos.enp
-    opp_occ = pos.color_bbs[not pos.color] | enp
+    opp_occ = pos.color_bbs[not pos.color] | square.BITS[enp]
     if pos.color:
         # single pawn moves
         regular = pawns & ~square.BIT_RANKS[6]
         promoting = pawns & square.BIT_RANKS[6]
-        single = bitboard.n(pawns) & not_occ
+        single = bitboard.n(regular) & not_occ
         for sq in bitboard.squares(single):
-            moves.append(move.mv(piece.PAWN, square.s(sq), sq))
+            moves.append(move.mv(piece.PAWN, sq - 8, sq))
         for sq in bitboard.squares(bitboard.n(promoting) & not_occ):
-            _make_promotions(moves, sq, square.s(sq))
+            _make_promotions(moves, sq, sq - 8)
 
         # east attacks
         for sq in bitboard.squares(bitboard.ne(regular) & opp_occ):
             prm = piece.PAWN if sq == enp else piece.NONE
-            moves.append(move.mv(piece.PAWN, square.sw(sq), sq, prm))
+            moves.append(move.mv(piece.PAWN, sq - 9, sq, prm))
         for sq in bitboard.squares(bitboard.ne(promoting) & opp_occ):
-            _make_promotions(moves, sq, square.sw(sq))
+            _make_promotions(moves, sq, sq - 9)
 
         # west attacks
         for sq in bitboard.squares(bitboard.nw(regular) & opp_occ):
             prm = piece.PAWN if sq == enp else piece.NONE
-            moves.append(move.mv(piece.PAWN, square.se(sq), sq, prm))
+            moves.append(move.mv(piece.PAWN, sq - 7, sq, prm))
         for sq in bitboard.squares(bitboard.nw(promoting) & opp_occ):
-            _make_promotions(moves, sq, square.se(sq))
+            _make_promotions(moves, sq, sq - 7)
 
         # double pawn moves
         doubles = bitboard.n(single & square.BIT_RANKS[2])
         for sq in bitboard.squares(doubles & not_occ):
-            moves.append(move.mv(piece.PAWN, square.ss(sq), sq))
+            moves.append(move.mv(piece.PAWN, sq - 16, sq))
 
     else:
         # single pawn moves
         regular = pawns & ~square.BIT_RANKS[1]
         promoting = pawns & square.BIT_RANKS[1]
-        single = bitboard.s(pawns) & not_occ
+        single = bitboard.s(regular) & not_occ
         for sq in bitboard.squares(single):
-            moves.append(move.mv(piece.PAWN, square.n(sq), sq))
+            moves.append(move.mv(piece.PAWN, sq + 8, sq))
         for sq in bitboard.squares(bitboard.s(promoting) & not_occ):
-            _make_promotions(moves, sq, square.n(sq))
+            _make_promotions(moves, sq, sq + 8)
 
         # east attacks
         for sq in bitboard.squares(bitboard.se(regular) & opp_occ):
             prm = piece.PAWN if sq == enp else piece.NONE
-            moves.append(move.mv(piece.PAWN, square.nw(sq), sq, prm))
+            moves.append(move.mv(piece.PAWN, sq + 7, sq, prm))
         for sq in bitboard.squares(bitboard.se(promoting) & opp_occ):
-            _make_promotions(moves, sq, square.nw(sq))
+            _make_promotions(moves, sq, sq + 7)
 
         # west attacks
         for sq in bitboard.squares(bitboard.sw(regular) & opp_occ):
             prm = piece.PAWN if sq == enp else piece.NONE
-            moves.append(move.mv(piece.PAWN, square.ne(sq), sq, prm))
+            moves.append(move.mv(piece.PAWN, sq + 9, sq, prm))
         for sq in bitboard.squares(bitboard.sw(promoting) & opp_occ):
-            _make_promotions(moves, sq, square.ne(sq))
+            _make_promotions(moves, sq, sq + 9)
 
         # double pawn moves
         doubles = bitboard.s(single & square.BIT_RANKS[5])
         for sq in bitboard.squares(doubles & not_occ):
-            moves.append(move.mv(piece.PAWN, square.nn(sq), sq))
+            moves.append(move.mv(piece.PAWN, sq + 16, sq))
 
 
 def get_pawn_moves_2(pos, moves):
     pawns = pos.piece_bbs[piece.PAWN] & pos.color_bbs[pos.color]
     not_occ = ~(pos.occupied)
-    enp = pos.en_passant
-    opp_occ = pos.color_bbs[not pos.color] | enp
+    enp = pos.enp
+    opp_occ = pos.color_bbs[not pos.color] | square.BITS[enp]
     if pos.color:
-        sets = ((bitboard.n, square.s, not_occ),
-                 (bitboard.nw, square.se, opp_occ),
-                 (bitboard.ne, square.sw, opp_occ))
+        sets = ((bitboard.n, -8, not_occ),
+                 (bitboard.nw, -7, opp_occ),
+                 (bitboard.ne, -9, opp_occ))
         pro_rank, dbl_rank, push, = 6, 1, bitboard.n
-        dfwd, dback = bitboard.nn, square.ss
+        dfwd, dback = bitboard.nn, -16
     else:
-        sets = ((bitboard.s, square.n, not_occ),
-                 (bitboard.se, square.nw, opp_occ),
-                 (bitboard.sw, square.ne, opp_occ))
+        sets = ((bitboard.s, 8, not_occ),
+                 (bitboard.se, 7, opp_occ),
+                 (bitboard.sw, 9, opp_occ))
         pro_rank, dbl_rank, push, = 1, 6, bitboard.s
-        dfwd, dback = bitboard.ss, square.nn
+        dfwd, dback = bitboard.ss, 16
 
     regular = pawns & ~square.BIT_RANKS[pro_rank]
     promoting = pawns & square.BIT_RANKS[pro_rank]
     for fwd, back, occ in sets:
         for sq in bitboard.squares(fwd(regular) & occ):
             prm = piece.PAWN if sq == enp else piece.NONE
-            moves.append(move.mv(piece.PAWN, back(sq), sq, prm))
+            moves.append(move.mv(piece.PAWN, sq + back, sq, prm))
         for sq in bitboard.squares(fwd(promoting) & occ):
-            _make_promotions(moves, sq, back(sq))
+            _make_promotions(moves, sq, sq + back)
 
     # double pawn moves
     occ = ~(pos.occupied | push(pos.occupied))
     double = (regular & square.BIT_RANKS[dbl_rank])
     for sq in bitboard.squares(dfwd(double) & occ):
-        moves.append(move.mv(piece.PAWN, dback(sq), sq))
+        moves.append(move.mv(piece.PAWN, sq + dback, sq))
 
 
 def get_knight_moves(pos, moves):
@@ -136,11 +134,13 @@ def get_knight_moves(pos, moves):
 
 
 def get_king_moves(pos, moves):
-    frsq = pos.piece_bbs[piece.KING] & pos.color_bbs[pos.color]
+    frsq = bitboard.lsb(pos.piece_bbs[piece.KING] & pos.color_bbs[pos.color])
     not_own_occ = ~pos.color_bbs[pos.color]
     for tosq in bitboard.squares(ATTACKS[piece.KING][frsq] & not_own_occ):
         if not attacked(pos, tosq):
             moves.append(move.mv(piece.KING, frsq, tosq))
+    if not pos.castle & CASTLE_FLAGS[pos.color] or attacked(pos, frsq):
+        return
     for flag, tosq, step, inter in CASTLE_FLAG_MAP[pos.color]:
         if (not (pos.castle & flag) or inter & pos.occupied
             or attacked(pos, step) or attacked(pos, tosq)):
@@ -153,9 +153,13 @@ def _get_sliding_moves(pos, moves, pc, source=None):
         source = pc
     pieces = pos.piece_bbs[source] & pos.color_bbs[pos.color]
     not_own_occ = ~pos.color_bbs[pos.color]
+    occupied = pos.occupied
+    table = magic.TABLES[pc]
     for frsq in bitboard.squares(pieces):
-        occ = pos.occupied & MASK[pc][frsq]
-        for tosq in bitboard.squares(OCC_ATTACKS[pc][frsq][occ] & not_own_occ):
+        mask, mul, shift, offset = MAGIC[pc][frsq]
+        attacks = table[offset + ((((occupied & mask) * mul)
+                                   & magic.FULL) >> shift)]
+        for tosq in bitboard.squares(attacks & not_own_occ):
             moves.append(move.mv(source, frsq, tosq))
 
 
@@ -180,110 +184,363 @@ def attacked(pos, sq, opp_cl=None):
         return True
     if ATTACKS[piece.KNIGHT][sq] & opp_occ & pos.piece_bbs[piece.KNIGHT]:
         return True
+    occupied = pos.occupied
     for pc in (piece.ROOK, piece.BISHOP):
-        occ = pos.occupied & MASK[pc][sq]
+        mask, mul, shift, offset = MAGIC[pc][sq]
+        attacks = magic.TABLES[pc][offset + ((((occupied & mask) * mul)
+                                               & magic.FULL) >> shift)]
         pcs_or_qs = pos.piece_bbs[piece.QUEEN] | pos.piece_bbs[pc]
-        if OCC_ATTACKS[pc][sq][occ] & opp_occ & pcs_or_qs:
+        if attacks & opp_occ & pcs_or_qs:
             return True
-    if opp_cl:
-        pawn_attacks = square.sw(sq) | square.se(sq)
-    else:
-        pawn_attacks = square.nw(sq) | square.ne(sq)
-    if pawn_attacks & opp_occ & pos.piece_bbs[piece.PAWN]:
+    if PAWN_ATTACKS[not opp_cl][sq] & opp_occ & pos.piece_bbs[piece.PAWN]:
         return True
     return False
 
 
 def king_attacked(pos, cl):
-    sq = pos.piece_bbs[piece.KING] & pos.color_bbs[cl]
+    sq = bitboard.lsb(pos.piece_bbs[piece.KING] & pos.color_bbs[cl])
     return attacked(pos, sq, not cl)
 
 
-def _calc_slide_attacks(sq, occ, pc):
-    result = 0L
-    dirs = ['ne', 'se', 'sw', 'nw'] if pc == piece.BISHOP else 'nesw'
-    for dir in dirs:
-        for test in square.walk(sq, dir):
-            result |= test
-            if test & occ:
-                break
-    return result
+def slider_attacks(pc, sq, occupied):
+    mask, mul, shift, offset = MAGIC[pc][sq]
+    return magic.TABLES[pc][offset + ((((occupied & mask) * mul)
+                                        & magic.FULL) >> shift)]
+
+
+def attackers_to(pos, sq, occupied):
+    # NOTE: occupied only decides which slider rays are blocked. Pieces
+    #       are taken from the board, so callers that lift pieces off
+    #       must mask them out of the result.
+    piece_bbs = pos.piece_bbs
+    queens = piece_bbs[piece.QUEEN]
+    pawns = piece_bbs[piece.PAWN]
+    return ((ATTACKS[piece.KNIGHT][sq] & piece_bbs[piece.KNIGHT]) |
+            (ATTACKS[piece.KING][sq] & piece_bbs[piece.KING]) |
+            (PAWN_ATTACKS[1][sq] & pawns & pos.color_bbs[0]) |
+            (PAWN_ATTACKS[0][sq] & pawns & pos.color_bbs[1]) |
+            (slider_attacks(piece.BISHOP, sq, occupied) &
+             (piece_bbs[piece.BISHOP] | queens)) |
+            (slider_attacks(piece.ROOK, sq, occupied) &
+             (piece_bbs[piece.ROOK] | queens)))
+
+
+# NOTE: NOISY moves are captures, en passant and promotions, QUIET moves
+#       are everything else, castling included
+ALL, NOISY, QUIET = range(3)
+
+
+def _get_legal_pawn_moves(moves, cl, pawns, empty, opp_occ, target,
+                          kind=ALL):
+    pushes = target
+    captures = target
+    if kind == NOISY:
+        pushes = 0L
+    elif kind == QUIET:
+        captures = 0L
+    if cl:
+        promoting = pawns & square.BIT_RANKS[6]
+        pawns ^= promoting
+        if kind == QUIET:
+            promoting = 0L
+        single = bitboard.n(pawns) & empty
+        sets = ((single & pushes, -8),
+                (bitboard.n(single & square.BIT_RANKS[2]) & empty & pushes,
+                 -16),
+                (bitboard.nw(pawns) & opp_occ & captures, -7),
+                (bitboard.ne(pawns) & opp_occ & captures, -9))
+        if promoting:
+            promotions = ((bitboard.n(promoting) & empty & target, -8),
+                          (bitboard.nw(promoting) & opp_occ & target, -7),
+                          (bitboard.ne(promoting) & opp_occ & target, -9))
+    else:
+        promoting = pawns & square.BIT_RANKS[1]
+        pawns ^= promoting
+        if kind == QUIET:
+            promoting = 0L
+        single = bitboard.s(pawns) & empty
+        sets = ((single & pushes, 8),
+                (bitboard.s(single & square.BIT_RANKS[5]) & empty & pushes,
+                 16),
+                (bitboard.se(pawns) & opp_occ & captures, 7),
+                (bitboard.sw(pawns) & opp_occ & captures, 9))
+        if promoting:
+            promotions = ((bitboard.s(promoting) & empty & target, 8),
+                          (bitboard.se(promoting) & opp_occ & target, 7),
+                          (bitboard.sw(promoting) & opp_occ & target, 9))
+    for tosqs, back in sets:
+        for sq in bitboard.squares(tosqs):
+            moves.append(move.mv(piece.PAWN, sq + back, sq))
+    if promoting:
+        for tosqs, back in promotions:
+            for sq in bitboard.squares(tosqs):
+                _make_promotions(moves, sq, sq + back)
+
+
+def get_legal_moves(pos, moves, kind=ALL):
+    cl = pos.color
+    own = pos.color_bbs[cl]
+    opp_occ = pos.color_bbs[not cl]
+    occupied = own | opp_occ
+    piece_bbs = pos.piece_bbs
+    ksq = bitboard.lsb(piece_bbs[piece.KING] & own)
+    if kind == NOISY:
+        kinds = opp_occ
+    elif kind == QUIET:
+        kinds = ~occupied
+    else:
+        kinds = magic.FULL
+
+    # king moves, with the king lifted so it can't hide behind itself
+    without_king = occupied ^ square.BITS[ksq]
+    for tosq in bitboard.squares(ATTACKS[piece.KING][ksq] & ~own & kinds):
+        if not attackers_to(pos, tosq, without_king) & opp_occ:
+            moves.append(move.mv(piece.KING, ksq, tosq))
+
+    checkers = attackers_to(pos, ksq, occupied) & opp_occ
+    if checkers & (checkers - 1):
+        # only the king can escape a double check
+        return
+    if checkers:
+        target = BETWEEN[ksq][bitboard.lsb(checkers)] | checkers
+    else:
+        target = magic.FULL
+        if pos.castle & CASTLE_FLAGS[cl] and kind != NOISY:
+            for flag, tosq, step, inter in CASTLE_FLAG_MAP[cl]:
+                if (not (pos.castle & flag) or inter & occupied
+                    or attackers_to(pos, step, occupied) & opp_occ
+                    or attackers_to(pos, tosq, occupied) & opp_occ):
+                    continue
+                moves.append(move.mv(piece.KING, ksq, tosq, piece.KING))
+
+    # a piece is pinned if it is the only thing between the king and an
+    # enemy slider on the same line
+    pinned = 0L
+    queens = piece_bbs[piece.QUEEN]
+    snipers = opp_occ & (
+        (ATTACKS[piece.BISHOP][ksq] & (piece_bbs[piece.BISHOP] | queens)) |
+        (ATTACKS[piece.ROOK][ksq] & (piece_bbs[piece.ROOK] | queens)))
+    for sq in bitboard.squares(snipers):
+        blockers = BETWEEN[ksq][sq] & occupied
+        if blockers and not blockers & (blockers - 1):
+            pinned |= blockers & own
+
+    movable = ~own & target & kinds
+    knights = piece_bbs[piece.KNIGHT] & own & ~pinned
+    for frsq in bitboard.squares(knights):
+        for tosq in bitboard.squares(ATTACKS[piece.KNIGHT][frsq] & movable):
+            moves.append(move.mv(piece.KNIGHT, frsq, tosq))
 
+    for pc, slide in ((piece.BISHOP, piece.BISHOP), (piece.ROOK, piece.ROOK),
+                      (piece.QUEEN, piece.BISHOP), (piece.QUEEN, piece.ROOK)):
+        table = magic.TABLES[slide]
+        magics = MAGIC[slide]
+        for frsq in bitboard.squares(piece_bbs[pc] & own):
+            mask, mul, shift, offset = magics[frsq]
+            attacks = table[offset + ((((occupied & mask) * mul)
+                                       & magic.FULL) >> shift)] & movable
+            if pinned & square.BITS[frsq]:
+                attacks &= LINE[ksq][frsq]
+            for tosq in bitboard.squares(attacks):
+                moves.append(move.mv(pc, frsq, tosq))
+
+    pawns = piece_bbs[piece.PAWN] & own
+    empty = ~occupied
+    _get_legal_pawn_moves(moves, cl, pawns & ~pinned, empty, opp_occ, target,
+                          kind)
+    for frsq in bitboard.squares(pawns & pinned):
+        _get_legal_pawn_moves(moves, cl, square.BITS[frsq], empty, opp_occ,
+                              target & LINE[ksq][frsq], kind)
+
+    # en passant can expose the king along the rank of both pawns, so each
+    # candidate is checked against the board after the capture
+    enp = pos.enp
+    if enp != square.NONE and kind != QUIET:
+        capbit = square.BITS[enp - 8 if cl else enp + 8]
+        for frsq in bitboard.squares(PAWN_ATTACKS[not cl][enp] & pawns):
+            after = (occupied ^ square.BITS[frsq] ^ capbit) | square.BITS[enp]
+            if not attackers_to(pos, ksq, after) & opp_occ & ~capbit:
+                moves.append(move.mv(piece.PAWN, frsq, enp, piece.PAWN))
+
+
+def is_legal(pos, mv):
+    cl = pos.color
+    own = pos.color_bbs[cl]
+    opp_occ = pos.color_bbs[not cl]
+    occupied = own | opp_occ
+    frsq = move.frsq(mv)
+    tosq = move.tosq(mv)
+    pc = move.piece(mv)
+    prm = move.promotion(mv)
+    tobit = square.BITS[tosq]
+    if (pos.squares[frsq] != pc or not own & square.BITS[frsq]
+        or own & tobit):
+        return False
+
+    if prm == piece.KING:
+        if pc != piece.KING:
+            return False
+        moves = []
+        get_legal_moves(pos, moves, QUIET)
+        return mv in moves
+
+    captured = tobit
+    if pc == piece.PAWN:
+        if prm == piece.PAWN:
+            if tosq != pos.enp or not PAWN_ATTACKS[cl][frsq] & tobit:
+                return False
+            captured = square.BITS[tosq - 8 if cl else tosq + 8]
+        else:
+            if bool(prm) != (square.rank(tosq) in (0, 7)):
+                return False
+            step = 8 if cl else -8
+            if tosq == frsq + step:
+                if occupied & tobit:
+                    return False
+            elif tosq == frsq + 2 * step:
+                if (square.rank(frsq) != (1 if cl else 6)
+                    or occupied & (tobit | square.BITS[frsq + step])):
+                    return False
+            elif not PAWN_ATTACKS[cl][frsq] & tobit & opp_occ:
+                return False
+    elif prm:
+        return False
+    elif pc == piece.KNIGHT or pc == piece.KING:
+        if not ATTACKS[pc][frsq] & tobit:
+            return False
+    else:
+        attacks = 0L
+        if pc != piece.ROOK:
+            attacks |= slider_attacks(piece.BISHOP, frsq, occupied)
+        if pc != piece.BISHOP:
+            attacks |= slider_attacks(piece.ROOK, frsq, occupied)
+        if not attacks & tobit:
+            return False
+
+    if pc == piece.KING:
+        return not (attackers_to(pos, tosq, occupied ^ square.BITS[frsq])
+                    & opp_occ & ~tobit)
+    ksq = bitboard.lsb(pos.piece_bbs[piece.KING] & own)
+    after = (occupied ^ square.BITS[frsq] ^ (captured & ~tobit)) | tobit
+    return not attackers_to(pos, ksq, after) & opp_occ & ~captured & ~tobit
+
+
+def gives_check(pos, mv):
+    cl = pos.color
+    own = pos.color_bbs[cl]
+    piece_bbs = pos.piece_bbs
+    ksq = bitboard.lsb(piece_bbs[piece.KING] & pos.color_bbs[not cl])
+    frsq = move.frsq(mv)
+    tosq = move.tosq(mv)
+    pc = move.piece(mv)
+    prm = move.promotion(mv)
+    moved = square.BITS[frsq]
+    occupied = (pos.occupied ^ moved) | square.BITS[tosq]
+    if prm == piece.PAWN:
+        occupied ^= square.BITS[tosq - 8 if cl else tosq + 8]
+    elif prm == piece.KING:
+        # the king can't give check, but the rook it castles with can
+        rfrsq, tosq = CASTLE_ROOK_SQUARES[tosq]
+        moved |= square.BITS[rfrsq]
+        occupied ^= square.BITS[rfrsq] | square.BITS[tosq]
+        pc = piece.ROOK
+    elif prm:
+        pc = prm
+
+    kbit = square.BITS[ksq]
+    if pc == piece.PAWN:
+        if PAWN_ATTACKS[cl][tosq] & kbit:
+            return True
+    elif pc == piece.KNIGHT:
+        if ATTACKS[piece.KNIGHT][tosq] & kbit:
+            return True
+    elif pc != piece.KING:
+        if pc != piece.ROOK and (slider_attacks(piece.BISHOP, tosq, occupied)
+                                 & kbit):
+            return True
+        if pc != piece.BISHOP and (slider_attacks(piece.ROOK, tosq, occupied)
+                                   & kbit):
+            return True
 
-def _occ_attack_table(sq, pc):
-    mask = MASK[pc][sq]
-    bits = bitboard.ones(mask)
-    attacks = {}
-    for occ_index in xrange(1 << bits):
-        occ = 0L
-        for sq_index, test_sq in enumerate(bitboard.squares(mask)):
-            if occ_index & (1L << sq_index):
-                occ |= test_sq
-        attacks[occ] = _calc_slide_attacks(sq, occ, pc)
-    return attacks
+    # discovered checks from sliders behind the piece that moved
+    own &= ~moved
+    queens = piece_bbs[piece.QUEEN]
+    return bool((slider_attacks(piece.BISHOP, ksq, occupied) & own &
+                 (piece_bbs[piece.BISHOP] | queens)) or
+                (slider_attacks(piece.ROOK, ksq, occupied) & own &
+                 (piece_bbs[piece.ROOK] | queens)))
 
 
 def _king_moves(sq):
-    return (square.n(sq) | square.s(sq) | square.e(sq) | square.w(sq) |
-            square.ne(sq) | square.se(sq) | square.sw(sq) | square.nw(sq))
+    return _bits(square.n(sq), square.s(sq), square.e(sq), square.w(sq),
+                 square.ne(sq), square.se(sq), square.sw(sq), square.nw(sq))
 
 
 def _knight_moves(sq):
-    return (square.nne(sq) | square.ene(sq) | square.ese(sq) | square.sse(sq) |
-            square.ssw(sq) | square.wsw(sq) | square.wnw(sq) | square.nnw(sq))
+    return _bits(square.nne(sq), square.ene(sq), square.ese(sq),
+                 square.sse(sq), square.ssw(sq), square.wsw(sq),
+                 square.wnw(sq), square.nnw(sq))
+
+
+def _bits(*sqs):
+    return sum(square.BITS[sq] for sq in sqs)
 
 
 CASTLE_FLAG_MAP = (
     (
         (castle.BLACK_QUEEN, square.sq('c8'), square.sq('d8'),
-         square.sq('b8') | square.sq('c8') | square.sq('d8')),
+         _bits(square.sq('b8'), square.sq('c8'), square.sq('d8'))),
         (castle.BLACK_KING, square.sq('g8'), square.sq('f8'),
-         square.sq('f8') | square.sq('g8')),
+         _bits(square.sq('f8'), square.sq('g8'))),
     ),
     (
         (castle.WHITE_QUEEN, square.sq('c1'), square.sq('d1'),
-         square.sq('b1') | square.sq('c1') | square.sq('d1')),
+         _bits(square.sq('b1'), square.sq('c1'), square.sq('d1'))),
         (castle.WHITE_KING, square.sq('g1'), square.sq('f1'),
-         square.sq('f1') | square.sq('g1')),
+         _bits(square.sq('f1'), square.sq('g1'))),
     ),
     )
 
 
-if os.path.exists('attacks.pickle'):
-    with open('attacks.pickle') as f:
-        ATTACKS, MASK, OCC_ATTACKS = pickle.load(f)
-else:
-    ATTACKS = {}
-    ATTACKS[piece.BISHOP] = {}
-    ATTACKS[piece.ROOK] = {}
-    ATTACKS[piece.KING] = {}
-    ATTACKS[piece.KNIGHT] = {}
-    MASK = {}
-    MASK[piece.BISHOP] = {}
-    MASK[piece.ROOK] = {}
-    OCC_ATTACKS = {}
-    OCC_ATTACKS[piece.BISHOP] = {}
-    OCC_ATTACKS[piece.ROOK] = {}
-
-    for sq in square.all():
-        rank = square.BIT_RANKS[square.rank(sq)]
-        file = square.BIT_FILES[square.file(sq)]
-        a1h8 = square.BIT_A1H8[square.a1h8(sq)]
-        a8h1 = square.BIT_A8H1[square.a8h1(sq)]
-
-        ATTACKS[piece.BISHOP][sq] = a1h8 | a8h1
-        MASK[piece.BISHOP][sq] = (
-                (a1h8 & ~bitboard.msb(a1h8) & ~bitboard.lsb(a1h8)) |
-                (a8h1 & ~bitboard.msb(a8h1) & ~bitboard.lsb(a8h1))
-        )
-        ATTACKS[piece.ROOK][sq] = rank | file
-        MASK[piece.ROOK][sq] = (
-            (rank & ~bitboard.msb(rank) & ~bitboard.lsb(rank)) |
-            (file & ~bitboard.msb(file) & ~bitboard.lsb(file))
-        )
-        OCC_ATTACKS[piece.BISHOP][sq] = _occ_attack_table(sq, piece.BISHOP)
-        OCC_ATTACKS[piece.ROOK][sq] = _occ_attack_table(sq, piece.ROOK)
-        ATTACKS[piece.KING][sq] = _king_moves(sq)
-        ATTACKS[piece.KNIGHT][sq] = _knight_moves(sq)
-    with open('attacks.pickle', 'w') as f:
-        pickle.dump((ATTACKS, MASK, OCC_ATTACKS), f, -1)
+CASTLE_ROOK_SQUARES = {
+    square.sq('c8'): (square.sq('a8'), square.sq('d8')),
+    square.sq('g8'): (square.sq('h8'), square.sq('f8')),
+    square.sq('c1'): (square.sq('a1'), square.sq('d1')),
+    square.sq('g1'): (square.sq('h1'), square.sq('f1')),
+}
+
+
+CASTLE_FLAGS = (castle.BLACK_QUEEN | castle.BLACK_KING,
+                castle.WHITE_QUEEN | castle.WHITE_KING)
+
+
+ATTACKS = {}
+MAGIC = {}
+for pc in (piece.BISHOP, piece.ROOK):
+    MAGIC[pc] = [(magic.MASKS[pc][sq], magic.MAGICS[pc][sq],
+                  magic.SHIFTS[pc][sq], magic.OFFSETS[pc][sq])
+                 for sq in square.all()]
+ATTACKS[piece.BISHOP] = [square.BIT_A1H8[square.a1h8(sq)] |
+                         square.BIT_A8H1[square.a8h1(sq)]
+                         for sq in square.all()]
+ATTACKS[piece.ROOK] = [square.BIT_RANKS[square.rank(sq)] |
+                       square.BIT_FILES[square.file(sq)]
+                       for sq in square.all()]
+ATTACKS[piece.KING] = [_king_moves(sq) for sq in square.all()]
+ATTACKS[piece.KNIGHT] = [_knight_moves(sq) for sq in square.all()]
+PAWN_ATTACKS = (
+    [_bits(square.se(sq), square.sw(sq)) for sq in square.all()],
+    [_bits(square.ne(sq), square.nw(sq)) for sq in square.all()],
+)
+BETWEEN = [[0L] * 64 for sq in square.all()]
+LINE = [[0L] * 64 for sq in square.all()]
+for frsq in square.all():
+    for axis in (('n', 's'), ('e', 'w'), ('ne', 'sw'), ('nw', 'se')):
+        line = _bits(frsq, *[sq for dir in axis
+                             for sq in square.walk(frsq, dir)])
+        for dir in axis:
+            between = 0L
+            for tosq in square.walk(frsq, dir):
+                BETWEEN[frsq][tosq] = between
+                LINE[frsq][tosq] = line
+                between |= square.BITS[tosq]
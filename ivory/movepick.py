@@ -0,0 +1,83 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from ivory import move
+from ivory import movegen
+from ivory import ordering
+from ivory import piece
+from ivory import see
+
+
+VALUES = ordering.VALUES
+
+
+def is_quiet(pos, mv):
+    return (not pos.squares[move.tosq(mv)] and
+            move.promotion(mv) in (piece.NONE, piece.KING))
+
+
+def moves(pos, hash_move=0, killers=(), order=None, prev=0):
+    # NOTE: each stage is only generated once the previous one has been
+    #       used up, so a cutoff on an early move skips the rest. With an
+    #       ordering the countermove to prev follows the killers and quiet
+    #       moves come out by history score.
+    if hash_move and movegen.is_legal(pos, hash_move):
+        yield hash_move
+
+    noisy = []
+    movegen.get_legal_moves(pos, noisy, movegen.NOISY)
+    captures = []
+    promotions = []
+    losing = []
+    for mv in noisy:
+        if mv == hash_move:
+            continue
+        victim = pos.squares[move.tosq(mv)]
+        if not victim and move.promotion(mv) != piece.PAWN:
+            promotions.append(mv)
+        # NOTE: taking a more valuable piece can't lose material, so the
+        #       exchange only needs to be played out for the others
+        elif (VALUES[victim] > VALUES[move.piece(mv)]
+              or see.see(pos, mv) >= 0):
+            captures.append(mv)
+        else:
+            losing.append(mv)
+    for mv in ordering.sort_captures(pos, captures):
+        yield mv
+    promotions.sort(key=move.promotion, reverse=True)
+    for mv in promotions:
+        yield mv
+
+    tried = [hash_move]
+    if order is not None:
+        killers = list(killers) + [order.countermove(prev)]
+    for mv in killers:
+        if (mv and mv not in tried and is_quiet(pos, mv)
+            and movegen.is_legal(pos, mv)):
+            tried.append(mv)
+            yield mv
+
+    quiet = []
+    movegen.get_legal_moves(pos, quiet, movegen.QUIET)
+    if order is not None:
+        quiet = order.sort_quiets(pos.color, quiet)
+    for mv in quiet:
+        if mv not in tried:
+            yield mv
+
+    for mv in ordering.sort_captures(pos, losing):
+        yield mv
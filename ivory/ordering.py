@@ -0,0 +1,99 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from ivory import move
+from ivory import piece
+
+
+# NOTE: moves fit in 32 bits, so a score shifted above them sorts the
+#       packed ints by score and the move is recovered with a mask. This
+#       works for negative scores too.
+SHIFT = 32
+MOVE_MASK = (1 << SHIFT) - 1
+
+# NOTE: piece values for most valuable victim, least valuable attacker
+VALUES = (0, 1, 3, 3, 5, 9, 100)
+
+# NOTE: history scores are halved for every entry once any reaches this
+HISTORY_LIMIT = 1 << 16
+
+
+def mvv_lva(pos, mv):
+    victim = pos.squares[move.tosq(mv)] or piece.PAWN
+    return VALUES[victim] * 8 - VALUES[move.piece(mv)]
+
+
+def sort_captures(pos, moves):
+    packed = [(mvv_lva(pos, mv) << SHIFT) | mv for mv in moves]
+    packed.sort(reverse=True)
+    return [mv & MOVE_MASK for mv in packed]
+
+
+def _index(mv):
+    return (move.frsq(mv) << 6) | move.tosq(mv)
+
+
+class Ordering(object):
+    # NOTE: quiet move ordering state that lives across the nodes of a
+    #       search: two killers per ply, butterfly history for each colour
+    #       and the move that last refuted each previous move.
+    def __init__(self, plies=64):
+        self.plies = plies
+        self.clear()
+
+    def clear(self):
+        self.history = ([0] * 4096, [0] * 4096)
+        self.countermoves = [0] * 4096
+        self.clear_killers()
+
+    def clear_killers(self):
+        self.killers = [[0, 0] for ply in xrange(self.plies)]
+
+    def age(self):
+        for table in self.history:
+            for i in xrange(4096):
+                table[i] >>= 1
+
+    def countermove(self, prev):
+        return self.countermoves[_index(prev)] if prev else 0
+
+    def sort_quiets(self, cl, moves):
+        history = self.history[cl]
+        packed = [(history[_index(mv)] << SHIFT) | mv for mv in moves]
+        packed.sort(reverse=True)
+        return [mv & MOVE_MASK for mv in packed]
+
+    def cutoff(self, cl, mv, depth, ply, prev, tried):
+        # NOTE: mv is the quiet move that failed high and tried holds the
+        #       quiet moves searched before it, which get the same penalty
+        killers = self.killers[ply]
+        if killers[0] != mv:
+            killers[1] = killers[0]
+            killers[0] = mv
+        if prev:
+            self.countermoves[_index(prev)] = mv
+        history = self.history[cl]
+        bonus = depth * depth
+        worst = 0
+        for other in tried:
+            index = _index(other)
+            history[index] -= bonus
+            worst = min(worst, history[index])
+        index = _index(mv)
+        history[index] += bonus
+        if history[index] >= HISTORY_LIMIT or worst <= -HISTORY_LIMIT:
+            self.age()
@@ -0,0 +1,247 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import multiprocessing
+import os
+import re
+
+from ivory import position
+
+TAG, MOVE, RESULT, NAG, COMMENT, OPEN, CLOSE = range(7)
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+TOKEN = re.compile(r'''
+    \[\s*(?P<tag>\w+)\s*"(?P<value>(?:[^"\\]|\\.)*)"\s*\]
+  | (?P<comment>[{;])
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<nag>\$\d+)
+  | (?P<result>1-0|0-1|1/2-1/2|\*)
+  | \d+\.+
+  | (?P<move>[^\s{};()\[\]$]+)
+''', re.VERBOSE)
+# NOTE: the importer cuts the file into chunks of about this many bytes,
+#       and keeps at most a couple of chunks per worker in flight
+CHUNK_SIZE = 1 << 22
+
+
+def tokenize(lines):
+    # NOTE: yields (kind, value) pairs. Tags carry a (name, value) pair,
+    #       move numbers are dropped and brace comments may span lines.
+    comment = None
+    for line in lines:
+        pos = 0
+        if comment is not None:
+            end = line.find('}')
+            if end < 0:
+                comment.append(line)
+                continue
+            comment.append(line[:end])
+            yield COMMENT, ''.join(comment).strip()
+            comment = None
+            pos = end + 1
+        elif line.startswith('%'):
+            continue
+        while True:
+            match = TOKEN.search(line, pos)
+            if not match:
+                break
+            pos = match.end()
+            kind = match.lastgroup
+            if kind == 'value':
+                value = match.group(kind).replace('\\"', '"')
+                yield TAG, (match.group('tag'), value.replace('\\\\', '\\'))
+            elif kind == 'comment':
+                if match.group(kind) == ';':
+                    yield COMMENT, line[pos:].strip()
+                    break
+                end = line.find('}', pos)
+                if end < 0:
+                    comment = [line[pos:]]
+                    break
+                yield COMMENT, line[pos:end].strip()
+                pos = end + 1
+            elif kind == 'open':
+                yield OPEN, '('
+            elif kind == 'close':
+                yield CLOSE, ')'
+            elif kind == 'nag':
+                yield NAG, int(match.group(kind)[1:])
+            elif kind == 'result':
+                yield RESULT, match.group(kind)
+            elif kind == 'move':
+                yield MOVE, match.group(kind)
+    if comment is not None:
+        yield COMMENT, ''.join(comment).strip()
+
+
+class Game(object):
+    __slots__ = ('tags', 'moves', 'result')
+
+    def __init__(self, tags=None, moves=None, result='*'):
+        self.tags = tags if tags is not None else {}
+        self.moves = moves if moves is not None else []
+        self.result = result
+
+    def __repr__(self):
+        return "(%r %s %s)" % (self.tags, ' '.join(self.moves), self.result)
+
+    @property
+    def fen(self):
+        return self.tags.get('FEN', START_FEN)
+
+
+def read(lines):
+    # NOTE: games are yielded one at a time, so memory only depends on
+    #       the longest game. Comments, nags and variations are dropped.
+    game = Game()
+    depth = 0
+    for kind, value in tokenize(lines):
+        if kind == TAG:
+            if game.moves:
+                yield game
+                game = Game()
+                depth = 0
+            game.tags[value[0]] = value[1]
+        elif kind == OPEN:
+            depth += 1
+        elif kind == CLOSE:
+            depth = max(depth - 1, 0)
+        elif depth:
+            continue
+        elif kind == MOVE:
+            game.moves.append(value)
+        elif kind == RESULT:
+            game.result = value
+            yield game
+            game = Game()
+    if game.tags or game.moves:
+        yield game
+
+
+def replay(game, pos=None):
+    # NOTE: like epd.load the position is updated in place. It is yielded
+    #       before each move with that move, and once more at the end
+    #       with a move of 0.
+    if pos is None:
+        pos = position.Position()
+    pos.fen = game.fen
+    for san in game.moves:
+        mv = pos.parse_san(san)
+        yield pos, mv
+        pos.make_move(mv)
+    yield pos, 0
+
+
+def _game_start(prev, line):
+    # NOTE: a game starts at a tag line after a blank line or after the
+    #       line holding the previous game's result
+    if not line.startswith('['):
+        return False
+    prev = prev.strip()
+    return not prev or prev.endswith(RESULTS)
+
+
+def _boundary(f, offset):
+    # NOTE: chunks start at the first game start after their offset. The
+    #       first whole line is only read as context, and since a chunk's
+    #       end is found the same way as the next one's start, every game
+    #       still belongs to exactly one chunk.
+    if not offset:
+        return 0
+    f.seek(offset - 1)
+    f.readline()
+    prev = f.readline()
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if not line or _game_start(prev, line):
+            return start
+        prev = line
+
+
+def _lines(f, start, end):
+    f.seek(start)
+    while f.tell() < end:
+        line = f.readline()
+        if not line:
+            break
+        yield line
+
+
+def _import_job(job):
+    path, offset, size, positions = job
+    with open(path, 'rb') as f:
+        start = _boundary(f, offset)
+        end = _boundary(f, offset + size)
+        games = read(_lines(f, start, end))
+        if not positions:
+            return list(games), 0
+        out = []
+        errors = 0
+        board = position.Position()
+        for game in games:
+            try:
+                # NOTE: a whole game is dropped if any move is bad
+                keys = [(pos.key, pos.to_bytes())
+                        for pos, mv in replay(game, board)]
+            except ValueError:
+                errors += 1
+                continue
+            out.extend(keys)
+        return out, errors
+
+
+def import_file(path, sink, workers=None, positions=False,
+                chunk_size=CHUNK_SIZE):
+    # NOTE: sink is called with every game, or with (key, packed) pairs
+    #       for every position if positions is set, in file order. Those
+    #       pairs can be passed straight to store.write. Returns the
+    #       number of items sent and the number of games dropped.
+    size = os.path.getsize(path)
+    jobs = ((path, offset, chunk_size, positions)
+            for offset in xrange(0, size, chunk_size))
+    pool = None
+    if workers and workers > 1:
+        pool = multiprocessing.Pool(workers)
+    pending = collections.deque()
+    count = errors = 0
+    try:
+        for job in jobs:
+            if pool:
+                pending.append(pool.apply_async(_import_job, (job,)))
+                if len(pending) < workers * 2:
+                    continue
+                items, failed = pending.popleft().get()
+            else:
+                items, failed = _import_job(job)
+            for item in items:
+                sink(item)
+            count += len(items)
+            errors += failed
+        while pending:
+            items, failed = pending.popleft().get()
+            for item in items:
+                sink(item)
+            count += len(items)
+            errors += failed
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+    return count, errors
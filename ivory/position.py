@@ -15,14 +15,68 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
+import multiprocessing
+import re
+import struct
+
+from ivory import bitboard
 from ivory import castle
+from ivory import evaluate
+from ivory import hashtable
 from ivory import move
 from ivory import movegen
 from ivory import piece
 from ivory import square
+from ivory import zobrist
+
+
+# NOTE: FEN lists ranks from the eighth down, each from the a file
+FEN_RANK_STARTS = tuple(square.from_a8(rank, 0) for rank in xrange(8))
+FEN_DIGITS = [str(count) for count in xrange(9)]
+FEN_CHARS = ([piece.str(pc) for pc in xrange(piece.KING + 1)],
+             [piece.str(pc).upper() for pc in xrange(piece.KING + 1)])
+FEN_PIECES = {}
+for cl in (0, 1):
+    for pc in piece.all():
+        FEN_PIECES[FEN_CHARS[cl][pc]] = (pc, cl)
+
+
+SAN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+SAN_TO_PIECE = dict((name, pc) for pc, name in enumerate(move.SAN_PIECES)
+                    if name)
+SAN_CASTLES = {'O-O': 6, 'O-O-O': 2, '0-0': 6, '0-0-0': 2}
+
+
+# NOTE: a packed position is the occupancy, sixteen bytes of piece nibbles
+#       and a state word, 32 bytes in all
+PACKED = struct.Struct('<Q16sQ')
+
+
+# NOTE: an immutable copy of a position. state packs the side to move,
+#       castle rights, en passant square, halfmove clock and move number.
+Snapshot = collections.namedtuple('Snapshot', ['piece_bbs', 'color_bbs',
+                                               'state', 'key', 'mg', 'eg',
+                                               'phase'])
 
 
 class Position(object):
+    STATS = ('num_captures', 'num_en_passant', 'num_checks', 'num_mates',
+             'num_promotions', 'num_castles')
+    # NOTE: slots keep instances small and attribute access fast. The
+    #       boards are lists indexed by piece, colour and square.
+    __slots__ = ('piece_bbs', 'color_bbs', 'squares', 'occupied', 'color',
+                 'castle', 'enp', 'halfmove_clock', 'move_num', 'key',
+                 'mg', 'eg', 'phase', 'undo', 'ply', 'perft_table') + STATS
+    # NOTE: each ply of the undo stack is UNDO_WIDTH words: the move, the
+    #       key before it, and the captured piece, castle rights, en
+    #       passant square and halfmove clock packed into one word. The
+    #       stack starts with room for UNDO_PLIES and doubles when full.
+    UNDO_WIDTH = 3
+    UNDO_PLIES = 32
+    # NOTE: set DEBUG to check the incremental key against a key computed
+    #       from scratch after every make_move and unmake_move.
+    DEBUG = False
     ROOK_SQUARES = (
         (square.sq('a8'), square.sq('h8')),
         (square.sq('a1'), square.sq('h1')),
@@ -37,52 +91,169 @@ class Position(object):
     def __init__(self, fen=None):
         if not fen:
             fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+        self.undo = bitboard.words(self.UNDO_PLIES * self.UNDO_WIDTH)
         self.fen = fen
+        self.perft_table = None
+        self.zero_stats()
+
+    def copy(self):
+        pos = self.__class__.__new__(self.__class__)
+        pos.piece_bbs = self.piece_bbs[:]
+        pos.color_bbs = self.color_bbs[:]
+        pos.occupied = self.occupied
+        pos.squares = self.squares[:]
+        pos.color = self.color
+        pos.castle = self.castle
+        pos.enp = self.enp
+        pos.halfmove_clock = self.halfmove_clock
+        pos.move_num = self.move_num
+        pos.key = self.key
+        pos.mg = self.mg
+        pos.eg = self.eg
+        pos.phase = self.phase
+        # NOTE: the undo stack comes along so the copy can unmake moves
+        #       and still sees repetitions
+        pos.undo = self.undo[:]
+        pos.ply = self.ply
+        pos.perft_table = None
+        pos.zero_stats()
+        return pos
+
+    def _get_state(self):
+        return (int(self.color) | (self.castle << 1) | (self.enp << 5) |
+                (self.halfmove_clock << 12) | (self.move_num << 28))
+
+    def _set_state(self, state):
+        self.color = state & 1
+        self.castle = (state >> 1) & 0xF
+        self.enp = (state >> 5) & 0x7F
+        self.halfmove_clock = (state >> 12) & 0xFFFF
+        self.move_num = state >> 28
+
+    def snapshot(self):
+        return Snapshot(tuple(self.piece_bbs), tuple(self.color_bbs),
+                        self._get_state(), self.key, self.mg, self.eg,
+                        self.phase)
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        pos = cls.__new__(cls)
+        pos.piece_bbs = list(snap.piece_bbs)
+        pos.color_bbs = list(snap.color_bbs)
+        pos.occupied = snap.color_bbs[0] | snap.color_bbs[1]
+        squares = [piece.NONE] * 64
+        for pc in piece.all():
+            for sq in bitboard.squares(snap.piece_bbs[pc]):
+                squares[sq] = pc
+        pos.squares = squares
+        pos._set_state(snap.state)
+        pos.key = snap.key
+        pos.mg = snap.mg
+        pos.eg = snap.eg
+        pos.phase = snap.phase
+        pos.undo = bitboard.words(cls.UNDO_PLIES * cls.UNDO_WIDTH)
+        pos.ply = 0
+        pos.perft_table = None
+        pos.zero_stats()
+        return pos
+
+    def to_bytes(self):
+        # NOTE: the occupancy bitboard, then a nibble for each occupied
+        #       square from a1 up holding the piece with 8 added for black,
+        #       then the same state word as a snapshot
+        squares = self.squares
+        black = self.color_bbs[0]
+        bits = square.BITS
+        codes = [squares[sq] | (8 if black & bits[sq] else 0)
+                 for sq in bitboard.squares(self.occupied)]
+        if len(codes) > 32:
+            raise ValueError('too many pieces to pack')
+        if len(codes) & 1:
+            codes.append(0)
+        nibbles = ''.join([chr(codes[i] | (codes[i + 1] << 4))
+                           for i in xrange(0, len(codes), 2)])
+        return PACKED.pack(self.occupied, nibbles, self._get_state())
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) != PACKED.size:
+            raise ValueError('packed position must be %d bytes' %
+                             PACKED.size)
+        occupied, nibbles, state = PACKED.unpack(data)
+        pos = cls.__new__(cls)
+        pos._clear()
+        piece_bbs = pos.piece_bbs
+        color_bbs = pos.color_bbs
+        squares = pos.squares
+        bits = square.BITS
+        keys = zobrist.PIECES
+        mgs = evaluate.MG
+        egs = evaluate.EG
+        phases = evaluate.PHASE_VALUES
+        key = mg = eg = phase = 0
+        for i, sq in enumerate(bitboard.squares(occupied)):
+            code = (ord(nibbles[i >> 1]) >> ((i & 1) << 2)) & 0xF
+            pc = code & 7
+            cl = 0 if code & 8 else 1
+            if not pc or pc > piece.KING:
+                raise ValueError('bad piece code in packed position')
+            bit = bits[sq]
+            piece_bbs[pc] |= bit
+            color_bbs[cl] |= bit
+            squares[sq] = pc
+            key ^= keys[cl][pc][sq]
+            mg += mgs[cl][pc][sq]
+            eg += egs[cl][pc][sq]
+            phase += phases[pc]
+        pos.occupied = occupied
+        pos._set_state(state)
+        if not pos.color:
+            key ^= zobrist.COLOR
+        pos.key = key ^ (zobrist.CASTLE[pos.castle] ^
+                         zobrist.EN_PASSANT[pos.enp])
+        pos.mg = mg
+        pos.eg = eg
+        pos.phase = phase
+        pos.undo = bitboard.words(cls.UNDO_PLIES * cls.UNDO_WIDTH)
+        pos.perft_table = None
+        pos.zero_stats()
+        return pos
 
     def __repr__(self):
         return "(%r)" % self.fen
 
-    def _get_square_color(self, sq):
-        if self.color_bbs[0] & sq:
-            return 0
-        return 1
-
     def __str__(self):
         out = []
         for rank in xrange(8):
             for file in xrange(8):
                 sq = square.from_a8(rank, file)
                 piece_str = piece.str(self.squares[sq])
-                if self.color_bbs[1] & sq:
+                if self.color_bbs[1] & square.BITS[sq]:
                     piece_str = piece_str.upper()
                 out.append(piece_str)
             out.append('\n')
         return ''.join(out)
 
     def _get_fen_board(self):
-        pieces = [None] * 64
-        for sq, pc in self.squares.iteritems():
-            if pc:
-                val = piece.str(pc)
-                if self._get_square_color(sq) == 1:
-                    val = val.upper()
-                pieces[square.index(sq)] = val
+        squares = self.squares
+        white = self.color_bbs[1]
+        bits = square.BITS
         ranks = []
-        for rank in xrange(8):
+        for start in FEN_RANK_STARTS:
+            out = []
             count = 0
-            out = ''
-            for file in xrange(8):
-                pc = pieces[square.index(square.from_a8(rank, file))]
-                if pc is None:
-                    count += 1
-                    if file == 7:
-                        out += '%d' % count
-                else:
+            for sq in xrange(start, start + 8):
+                pc = squares[sq]
+                if pc:
                     if count:
-                        out += '%d' % count
+                        out.append(FEN_DIGITS[count])
                         count = 0
-                    out += pc
-            ranks.append(out)
+                    out.append(FEN_CHARS[1 if white & bits[sq] else 0][pc])
+                else:
+                    count += 1
+            if count:
+                out.append(FEN_DIGITS[count])
+            ranks.append(''.join(out))
         return '/'.join(ranks)
 
     @property
@@ -90,7 +261,7 @@ class Position(object):
         board_string = self._get_fen_board()
 
         return ' '.join([board_string, 'bw'[self.color],
-                         castle.str(self.castle), self.enp or '-',
+                         castle.str(self.castle), square.str(self.enp),
                          str(self.halfmove_clock), str(self.move_num)])
 
     @staticmethod
@@ -99,13 +270,6 @@ class Position(object):
             raise ValueError("invalid color value: %s" % val)
         return 0 if val == 'b' else 1
 
-    @staticmethod
-    def _parse_piece_color(val):
-        if val.lower() in piece.PIECES:
-            return int(val.isupper())
-        else:
-            raise ValueError("invalid piece: %s" % val)
-
     @fen.setter
     def fen(self, value):
         try:
@@ -122,7 +286,6 @@ class Position(object):
                 self.enp = square.sq(enp)
             except ValueError:
                 raise ValueError('bad en passant data')
-            self.enp = enp
 
         try:
             self.halfmove_clock = int(clock)
@@ -134,71 +297,102 @@ class Position(object):
         except ValueError:
             raise ValueError('bad move number')
 
+        if not self.color:
+            self.key ^= zobrist.COLOR
+        self.key ^= (zobrist.CASTLE[self.castle] ^
+                     zobrist.EN_PASSANT[self.enp])
+
     def _clear(self):
-        self.piece_bbs = {}
-        for pc in piece.all():
-            self.piece_bbs[pc] = 0L
-        self.color_bbs = {}
-        self.color_bbs[0] = 0L
-        self.color_bbs[1] = 0L
-        self.squares = {}
-        for sq in square.all():
-            self.squares[sq] = 0L
+        self.piece_bbs = [0L] * (piece.KING + 1)
+        self.color_bbs = [0L, 0L]
+        self.occupied = 0L
+        self.squares = [piece.NONE] * 64
         self.castle = castle.parse('KQkq')
         self.enp = square.sq()
         self.halfmove_clock = 0
         self.move_num = 1
+        self.key = 0L
+        self.ply = 0
+        self.mg = 0
+        self.eg = 0
+        self.phase = 0
 
     def set_square(self, sq, pc, cl=None):
         if cl is None:
             cl = self.color
-        self.piece_bbs[pc] |= sq
-        self.color_bbs[cl] |= sq
+        bit = square.BITS[sq]
+        self.piece_bbs[pc] |= bit
+        self.color_bbs[cl] |= bit
+        self.occupied |= bit
         self.squares[sq] = pc
+        self.key ^= zobrist.PIECES[cl][pc][sq]
+        self.mg += evaluate.MG[cl][pc][sq]
+        self.eg += evaluate.EG[cl][pc][sq]
+        self.phase += evaluate.PHASE_VALUES[pc]
 
     def clear_square(self, sq):
         pc = self.squares[sq]
         if pc:
-            self.piece_bbs[pc] &= ~sq
-            self.color_bbs[0] &= ~sq
-            self.color_bbs[1] &= ~sq
-            self.squares[sq] = 0L
+            bit = square.BITS[sq]
+            cl = 1 if self.color_bbs[1] & bit else 0
+            self.key ^= zobrist.PIECES[cl][pc][sq]
+            self.mg -= evaluate.MG[cl][pc][sq]
+            self.eg -= evaluate.EG[cl][pc][sq]
+            self.phase -= evaluate.PHASE_VALUES[pc]
+            bit = ~bit
+            self.piece_bbs[pc] &= bit
+            self.color_bbs[0] &= bit
+            self.color_bbs[1] &= bit
+            self.occupied &= bit
+            self.squares[sq] = piece.NONE
         return pc
 
     def _parse_fen_board(self, board_string):
-        try:
-            ranks = board_string.split('/')
-            board = [[None] * 8 for x in range(8)]
-            for rank, data in enumerate(ranks):
-                file = 0
-                for char in data:
-                    if char.isdigit():
-                        num = int(char)
-                        if num < 1 or num > 8:
+        # NOTE: the board is filled in directly rather than through
+        #       set_square, with the key and scores summed on the way
+        ranks = board_string.split('/')
+        if len(ranks) != 8:
+            raise ValueError('wrong number of ranks')
+        piece_bbs = self.piece_bbs
+        color_bbs = self.color_bbs
+        squares = self.squares
+        bits = square.BITS
+        keys = zobrist.PIECES
+        mgs = evaluate.MG
+        egs = evaluate.EG
+        phases = evaluate.PHASE_VALUES
+        key = mg = eg = phase = 0
+        for start, data in zip(FEN_RANK_STARTS, ranks):
+            sq = start
+            end = start + 8
+            for char in data:
+                try:
+                    pc, cl = FEN_PIECES[char]
+                except KeyError:
+                    if char not in '12345678':
+                        if char.isdigit():
                             raise ValueError('bad integer in board data')
-                        file += num
-                    else:
-                        try:
-                            pc = piece.pc(char)
-                            cl = self._parse_piece_color(char)
-                            self.set_square(square.from_a8(rank, file), pc, cl)
-                            file += 1
-                        except ValueError:
-                            raise ValueError('bad piece in board data')
-                if file != 8:
+                        raise ValueError('bad piece in board data')
+                    sq += ord(char) - 48
+                    continue
+                if sq >= end:
                     raise ValueError('bad number of files')
-            if rank != 7:
-                raise ValueError('wrong number of ranks')
-            return board
-        except ValueError:
-            raise
-        except Exception:
-            raise
-            raise ValueError('error parsing fen board data')
-
-    @property
-    def occupied(self):
-        return self.color_bbs[0] | self.color_bbs[1]
+                bit = bits[sq]
+                piece_bbs[pc] |= bit
+                color_bbs[cl] |= bit
+                squares[sq] = pc
+                key ^= keys[cl][pc][sq]
+                mg += mgs[cl][pc][sq]
+                eg += egs[cl][pc][sq]
+                phase += phases[pc]
+                sq += 1
+            if sq != end:
+                raise ValueError('bad number of files')
+        self.occupied = color_bbs[0] | color_bbs[1]
+        self.key = key
+        self.mg = mg
+        self.eg = eg
+        self.phase = phase
 
     @property
     def pseudo_moves(self):
@@ -213,66 +407,152 @@ class Position(object):
 
     @property
     def legal_moves(self):
-        moves = self.pseudo_moves
-        legal = self._validate_moves(moves)
+        moves = []
+        movegen.get_legal_moves(self, moves)
+        return moves
+
+    @property
+    def annotated_moves(self):
+        legal = [self.annotate(mv) for mv in self.legal_moves]
         return self._disambiguate_moves(legal)
 
-    def _validate_moves(self, moves, check_end=True):
-        legal = []
-        for i, mv in enumerate(moves):
-            moving_color = self.color
-            pc = self.make_move(mv)
-            if not movegen.king_attacked(self, moving_color):
-                if pc:
-                    mv = move.set_capture(mv)
-
-                if check_end and movegen.king_attacked(self, self.color):
-                    if self._game_over():
-                        mv = move.set_mate(mv)
-                    else:
-                        mv = move.set_check(mv)
-                legal.append(mv)
-            self.unmake_move()
-        return legal
+    def is_capture(self, mv):
+        return bool(self.squares[move.tosq(mv)] or
+                    move.promotion(mv) == piece.PAWN)
+
+    def gives_check(self, mv):
+        return movegen.gives_check(self, mv)
+
+    def gives_mate(self, mv):
+        if not movegen.gives_check(self, mv):
+            return False
+        self.make_move(mv)
+        mate = self._game_over()
+        self.unmake_move()
+        return mate
+
+    def annotate(self, mv):
+        if self.is_capture(mv):
+            mv = move.set_capture(mv)
+        if self.gives_mate(mv):
+            mv = move.set_mate(mv)
+        elif self.gives_check(mv):
+            mv = move.set_check(mv)
+        return mv
 
     def _game_over(self):
-        moves = self.pseudo_moves
-        return not self._validate_moves(moves, False)
+        return not self.legal_moves
+
+    @staticmethod
+    def _disambiguate(mv, frsqs):
+        # NOTE: frsqs are the squares of every piece of the same type
+        #       that can reach the same target, including this one
+        if len(frsqs) < 2:
+            return mv
+        frsq = move.frsq(mv)
+        files = [square.FILE[sq] for sq in frsqs]
+        if files.count(square.FILE[frsq]) == 1:
+            return move.set_show_file(mv)
+        ranks = [square.RANK[sq] for sq in frsqs]
+        if ranks.count(square.RANK[frsq]) == 1:
+            return move.set_show_rank(mv)
+        return move.set_show_rank(move.set_show_file(mv))
 
     def _disambiguate_moves(self, moves):
-        files = {}
-        ranks = {}
-        unamb = list(moves)
+        groups = {}
         for mv in moves:
-            if move.promotion(mv):
+            pc = move.piece(mv)
+            if pc != piece.PAWN and pc != piece.KING:
+                groups.setdefault((pc, move.tosq(mv)),
+                                  []).append(move.frsq(mv))
+        return [self._disambiguate(mv, groups.get((move.piece(mv),
+                                                   move.tosq(mv)), ()))
+                for mv in moves]
+
+    def san(self, mv):
+        pc = move.piece(mv)
+        mv = self.annotate(mv)
+        if pc != piece.PAWN and pc != piece.KING:
+            tosq = move.tosq(mv)
+            mv = self._disambiguate(mv, [move.frsq(other)
+                                         for other in self.legal_moves
+                                         if move.tosq(other) == tosq and
+                                         move.piece(other) == pc])
+        return move.str(mv)
+
+    def parse_uci(self, text):
+        # NOTE: the move is built straight from the squares and checked
+        #       with is_legal, so no moves are generated
+        try:
+            frsq = square.SQUARE_TO_INT[text[0:2]]
+            tosq = square.SQUARE_TO_INT[text[2:4]]
+            prm = move.UCI_TO_PROMOTION[text[4:]] if text[4:] else piece.NONE
+        except KeyError:
+            raise ValueError('bad uci move: %s' % text)
+        pc = self.squares[frsq]
+        if len(text) == 4:
+            if pc == piece.KING and abs(square.FILE[frsq] -
+                                        square.FILE[tosq]) == 2:
+                prm = piece.KING
+            elif pc == piece.PAWN and tosq == self.enp:
+                prm = piece.PAWN
+        mv = move.mv(pc, frsq, tosq, prm)
+        if len(text) > 5 or not pc or not movegen.is_legal(self, mv):
+            raise ValueError('illegal uci move: %s' % text)
+        return mv
+
+    def parse_san(self, text):
+        # NOTE: matches against the generated moves by piece, target and
+        #       disambiguation rather than formatting every legal move
+        text = text.rstrip('+#!?')
+        if text in SAN_CASTLES:
+            file = SAN_CASTLES[text]
+            for mv in self.legal_moves:
+                if (move.promotion(mv) == piece.KING and
+                    square.FILE[move.tosq(mv)] == file):
+                    return mv
+            raise ValueError('illegal castle: %s' % text)
+        match = SAN.match(text)
+        if not match:
+            raise ValueError('bad san move: %s' % text)
+        pc, file, rank, target, prm = match.groups()
+        pc = SAN_TO_PIECE[pc] if pc else piece.PAWN
+        tosq = square.SQUARE_TO_INT[target]
+        if prm:
+            promotions = (SAN_TO_PIECE[prm],)
+        else:
+            promotions = (piece.NONE, piece.PAWN)
+        found = []
+        for mv in self.legal_moves:
+            if (move.tosq(mv) != tosq or move.piece(mv) != pc or
+                move.promotion(mv) not in promotions):
+                continue
+            frsq = move.frsq(mv)
+            if file and move.FILE_NAMES[frsq] != file:
                 continue
-            ps = (move.piece(mv), move.tosq(mv))
-            files.setdefault(ps, [])
-            ranks.setdefault(ps, [])
-            files[ps].append(square.file(move.frsq(mv)))
-            ranks[ps].append(square.rank(move.frsq(mv)))
-
-        opp_cl = not self.color
-        for i, mv in enumerate(moves):
-            ps = (move.piece(mv), move.tosq(mv))
-            if files[ps].count(square.file(move.frsq(mv))) > 1:
-                unamb[i] = moves[i].set_show_rank()
-            if ranks[ps].count(square.rank(move.frsq(mv))) > 1:
-                unamb[i] = moves[i].set_show_file()
-        return unamb
+            if rank and move.RANK_NAMES[frsq] != rank:
+                continue
+            found.append(mv)
+        if not found:
+            raise ValueError('illegal san move: %s' % text)
+        if len(found) > 1:
+            raise ValueError('ambiguous san move: %s' % text)
+        return found[0]
 
     def __getitem__(self, index):
-        return self.squares.get(index)
+        if 0 <= index < 64:
+            return self.squares[index]
+        return None
 
-    moves = []
     def make_move(self, mv):
         cl = self.color
         half, cast, enp = self.halfmove_clock, self.castle, self.enp
+        key = self.key
         self.color = not self.color
         opp_cl = self.color
         if cl == 0:
             self.move_num += 1
-        self.enp = 0L
+        self.enp = square.NONE
         frsq = move.frsq(mv)
         tosq = move.tosq(mv)
         prom = move.promotion(mv)
@@ -303,18 +583,36 @@ class Position(object):
             elif frsq == self.ROOK_SQUARES[cl][1]:
                 self.castle &= ~castle.KING[cl]
         elif mvpc == piece.PAWN:
-            back = square.n(tosq) if opp_cl == 1 else square.s(tosq)
+            back = tosq + 8 if opp_cl == 1 else tosq - 8
             if prom == piece.PAWN:
                 self.clear_square(back)
-            else:
-                diff = square.rank(frsq) - square.rank(tosq)
-                if diff == 2 or diff == -2:
-                    self.enp = back
-        self.moves.append((mv, pc, half, cast, enp))
+            elif frsq - tosq == 16 or tosq - frsq == 16:
+                self.enp = back
+        self.key ^= (zobrist.COLOR ^
+                     zobrist.CASTLE[cast] ^ zobrist.CASTLE[self.castle] ^
+                     zobrist.EN_PASSANT[enp] ^ zobrist.EN_PASSANT[self.enp])
+        undo = self.undo
+        i = self.ply * self.UNDO_WIDTH
+        if i == len(undo):
+            undo.extend(undo)
+        undo[i] = mv
+        undo[i + 1] = key
+        undo[i + 2] = pc | (cast << 4) | (enp << 8) | (half << 16)
+        self.ply += 1
+        if self.DEBUG:
+            self._check_key()
         return pc
 
     def unmake_move(self):
-        mv, pc, self.halfmove_clock, self.castle, self.enp = self.moves.pop()
+        self.ply -= 1
+        undo = self.undo
+        i = self.ply * self.UNDO_WIDTH
+        mv = undo[i]
+        state = undo[i + 2]
+        pc = state & 0xF
+        self.castle = (state >> 4) & 0xF
+        self.enp = (state >> 8) & 0xFF
+        self.halfmove_clock = state >> 16
         opp_cl = self.color
         self.color = not self.color
         cl = self.color
@@ -327,78 +625,159 @@ class Position(object):
         self.clear_square(tosq)
 
         if prom == piece.PAWN:
-            back = square.n if opp_cl == 1 else square.s
-            self.set_square(back(tosq), piece.PAWN, opp_cl)
+            back = tosq + 8 if opp_cl == 1 else tosq - 8
+            self.set_square(back, piece.PAWN, opp_cl)
         elif prom == piece.KING:
             rfrsq, rtosq = self.CASTLE_SQUARE_MAP[tosq]
             rook = self.clear_square(rtosq)
             self.set_square(rfrsq, rook, cl)
         if pc:
             self.set_square(tosq, pc, opp_cl)
-        if self.squares[square.sq('h1')] == piece.PAWN:
-            print move.str(mv), piece.str(pc)
-            raise Exception()
+        self.key = undo[i + 1]
+        if self.DEBUG:
+            self._check_key()
+
+    def is_repetition(self):
+        # NOTE: only positions since the last capture or pawn move can
+        #       repeat, and only with the same side to move
+        undo = self.undo
+        key = self.key
+        width = self.UNDO_WIDTH
+        for ply in xrange(self.ply - 4,
+                          max(self.ply - self.halfmove_clock, 0) - 1, -2):
+            if undo[ply * width + 1] == key:
+                return True
+        return False
+
+    def _check_key(self):
+        expected = zobrist.key(self)
+        if self.key != expected:
+            raise AssertionError('incremental key %016x != %016x' %
+                                 (self.key, expected))
 
     def zero_stats(self):
-        self.num_captures = 0
-        self.num_en_passant = 0
-        self.num_checks = 0
-        self.num_mates = 0
-        self.num_promotions = 0
-        self.num_castles = 0
-
-    def perft(self, depth):
-        nodes = 0
+        for name in self.STATS:
+            setattr(self, name, 0)
+
+    @property
+    def stats(self):
+        return tuple(getattr(self, name) for name in self.STATS)
+
+    def _add_stats(self, stats):
+        for name, val in zip(self.STATS, stats):
+            setattr(self, name, getattr(self, name) + val)
+
+    def perft(self, depth, hash_mb=None):
+        if hash_mb:
+            self.perft_table = hashtable.PerftTable(hash_mb)
+            return self._hashed_perft(depth, self.perft_table)
         if depth == 0:
             return 1
-        for mv in self.pseudo_moves:
-            pc = self.make_move(mv)
-            if not movegen.king_attacked(self, not self.color):
+        moves = self.legal_moves
+        if depth > 1:
+            nodes = 0
+            for mv in moves:
+                self.make_move(mv)
                 nodes += self.perft(depth - 1)
-                if depth == 1:
-                    if pc:
-                        self.num_captures += 1
-                    prm = move.promotion(mv)
-                    if prm:
-                        if prm == piece.PAWN:
-                            self.num_captures += 1
-                            self.num_en_passant += 1
-                        elif prm == piece.KING:
-                            self.num_castles += 1
-                        else:
-                            self.num_promotions += 1
-
-                    if movegen.king_attacked(self, self.color):
-                        self.num_checks += 1
-                        if self._game_over():
-                            self.num_mates += 1
-            self.unmake_move()
+                self.unmake_move()
+            return nodes
+
+        # NOTE: leaves are only played when they give check, to find mates
+        for mv in moves:
+            if self.squares[move.tosq(mv)]:
+                self.num_captures += 1
+            prm = move.promotion(mv)
+            if prm:
+                if prm == piece.PAWN:
+                    self.num_captures += 1
+                    self.num_en_passant += 1
+                elif prm == piece.KING:
+                    self.num_castles += 1
+                else:
+                    self.num_promotions += 1
+            if movegen.gives_check(self, mv):
+                self.num_checks += 1
+                self.make_move(mv)
+                if self._game_over():
+                    self.num_mates += 1
+                self.unmake_move()
+        return len(moves)
+
+    def _hashed_perft(self, depth, table):
+        # NOTE: subtrees can be reached through transpositions, so only
+        #       node counts are kept; the capture, check and other stats
+        #       are not collected in this mode.
+        if depth == 0:
+            return 1
+        nodes = table.probe(self.key, depth)
+        if nodes is not None:
+            return nodes
+        moves = self.legal_moves
+        if depth == 1:
+            # NOTE: every generated move is legal, so leaves are counted
+            #       without being played.
+            nodes = len(moves)
+        else:
+            nodes = 0
+            for mv in moves:
+                self.make_move(mv)
+                nodes += self._hashed_perft(depth - 1, table)
+                self.unmake_move()
+        table.store(self.key, depth, nodes)
         return nodes
 
+    def perft_divide(self, depth, workers=None):
+        if depth < 1:
+            raise ValueError('perft_divide needs a depth of at least 1')
+        self.zero_stats()
+        root = self.legal_moves
+        if depth == 1:
+            self.perft(depth)
+            return dict((mv, 1) for mv in root)
+        counts = dict((mv, 0) for mv in root)
+
+        # NOTE: splitting at the second ply gives the pool a few hundred
+        #       small jobs instead of a few dozen uneven ones.
+        snap = self.snapshot()
+        jobs = []
+        for mv in root:
+            if depth == 2:
+                jobs.append((snap, (mv,), depth - 1))
+                continue
+            self.make_move(mv)
+            for reply in self.legal_moves:
+                jobs.append((snap, (mv, reply), depth - 2))
+            self.unmake_move()
+
+        if workers == 1:
+            results = (_perft_divide_job(job) for job in jobs)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(workers)
+            results = pool.imap_unordered(_perft_divide_job, jobs)
+        try:
+            for mv, nodes, stats in results:
+                counts[mv] += nodes
+                self._add_stats(stats)
+        finally:
+            if pool:
+                pool.terminate()
+                pool.join()
+        return counts
+
+
+def _perft_divide_job(job):
+    snap, path, depth = job
+    pos = Position.from_snapshot(snap)
+    for mv in path:
+        pos.make_move(mv)
+    pos.zero_stats()
+    nodes = pos.perft(depth)
+    return path[0], nodes, pos.stats
+
 # NOTE(vish): insert constants into locals
 for sq in square.all():
     locals()[square.str(sq)] = sq
 
 for pc in piece.all():
     locals()[piece.str(pc)] = pc
-
-#fen = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
-fen = '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1'
-p1 = Position(fen)
-print piece.str(p1.squares[square.sq('a8')])
-import time
-import prettytable
-pt = prettytable.PrettyTable()
-pt.field_names = ['Depth', 'Nodes', 'Captures', 'E.p.', 'Castles',
-                  'Promotions', 'Checks', 'Mates', 'Time']
-pt.align = 'l'
-#import cProfile
-#cProfile.run('nodes = p1.perft(4)')
-for i in xrange(1, 6):
-    p1.zero_stats()
-    a = time.time()
-    nodes = p1.perft(i)
-    b = time.time()
-    pt.add_row([i, nodes, p1.num_captures, p1.num_en_passant, p1.num_castles,
-                p1.num_promotions, p1.num_checks, p1.num_mates, b - a])
-print pt
@@ -0,0 +1,308 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import argparse
+import collections
+import sys
+import time
+
+from ivory import evaluate
+from ivory import hashtable
+from ivory import move
+from ivory import movegen
+from ivory import movepick
+from ivory import ordering
+from ivory import piece
+from ivory import position
+from ivory import see
+
+
+INFINITY = 32000
+MATE = 31000
+MAX_PLY = 64
+# NOTE: scores beyond this are mates, and are stored in the table relative
+#       to the node rather than the root
+MATE_BOUND = MATE - MAX_PLY
+# NOTE: quiescence skips captures that can't get within this of alpha
+DELTA_MARGIN = 200
+# NOTE: the time and stop flag are only checked every CHECK_EVERY nodes
+CHECK_EVERY = 1024
+
+Result = collections.namedtuple('Result', ['move', 'score', 'pv', 'depth',
+                                           'nodes', 'time', 'nps'])
+
+
+def _to_table(score, ply):
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class Search(object):
+
+    def __init__(self, pos, table=None, hash_mb=16):
+        self.pos = pos
+        self.table = table or hashtable.SearchTable(hash_mb)
+        self.order = ordering.Ordering(MAX_PLY + 1)
+        self.nodes = 0
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+    def search(self, depth=None, nodes=None, movetime=None, callback=None):
+        # NOTE: stopped is cleared when a search returns rather than when
+        #       it starts, so a stop from another thread that arrives just
+        #       before the search gets going is not lost
+        pos = self.pos
+        self.nodes = 0
+        self.node_limit = nodes
+        self.deadline = None
+        self.start = time.time()
+        if movetime is not None:
+            self.deadline = self.start + movetime
+        self.order.clear_killers()
+        self.order.age()
+        self.path = [0] * (MAX_PLY + 1)
+        self.pv = [[] for ply in xrange(MAX_PLY + 2)]
+        max_depth = min(depth or MAX_PLY, MAX_PLY)
+
+        legal = pos.legal_moves
+        result = Result(legal[0] if legal else 0, 0, legal[:1], 0, 0, 0.0,
+                        0.0)
+        for iteration in xrange(1, max_depth + 1):
+            score = self._search(iteration, -INFINITY, INFINITY, 0)
+            if self.stopped and (iteration > 1 or not self.pv[0]):
+                # NOTE: a partial iteration may not have seen the best
+                #       reply to its best move, so trust the previous one
+                break
+            result = self._result(iteration, score)
+            if callback:
+                callback(result)
+            if self.stopped or not legal or abs(score) > MATE_BOUND:
+                break
+            if (self.deadline and
+                    time.time() - self.start > (movetime / 2.0)):
+                # NOTE: the next iteration would not finish in time
+                break
+        self.stopped = False
+        return result
+
+    def _result(self, depth, score):
+        elapsed = time.time() - self.start
+        pv = self.pv[0]
+        return Result(pv[0] if pv else 0, score, list(pv), depth,
+                      self.nodes, elapsed,
+                      self.nodes / elapsed if elapsed else 0.0)
+
+    def _check_limits(self):
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            self.stopped = True
+        elif self.deadline is not None and time.time() >= self.deadline:
+            self.stopped = True
+
+    def _search(self, depth, alpha, beta, ply):
+        pos = self.pos
+        self.pv[ply] = []
+        if depth > 0:
+            self.nodes += 1
+            if not self.nodes % CHECK_EVERY or self.node_limit is not None:
+                self._check_limits()
+        if self.stopped:
+            return 0
+        if ply:
+            if pos.halfmove_clock >= 100 or pos.is_repetition():
+                return 0
+        if depth <= 0 or ply >= MAX_PLY:
+            return self._quiesce(alpha, beta, ply)
+
+        table = self.table
+        hash_move = 0
+        entry = table.probe(pos.key)
+        if entry:
+            hash_move, score, entry_depth, bound = entry
+            # NOTE: no cutoffs on the pv, so it can be read back intact
+            if ply and entry_depth >= depth and beta - alpha == 1:
+                score = _from_table(score, ply)
+                if (bound == hashtable.EXACT or
+                        (bound == hashtable.LOWER and score >= beta) or
+                        (bound == hashtable.UPPER and score <= alpha)):
+                    return score
+
+        start_alpha = alpha
+        best = -INFINITY
+        best_move = 0
+        searched = 0
+        order = self.order
+        prev = self.path[ply - 1] if ply else 0
+        quiets = []
+        for mv in movepick.moves(pos, hash_move, order.killers[ply], order,
+                                 prev):
+            quiet = movepick.is_quiet(pos, mv)
+            self.path[ply] = mv
+            pos.make_move(mv)
+            if not searched:
+                score = -self._search(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # NOTE: prove the move is no better with a null window and
+                #       only search it fully when it is
+                score = -self._search(depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._search(depth - 1, -beta, -alpha, ply + 1)
+            pos.unmake_move()
+            searched += 1
+            if self.stopped:
+                return 0
+            if quiet:
+                quiets.append(mv)
+            if score > best:
+                best = score
+                best_move = mv
+                if score > alpha:
+                    alpha = score
+                    self.pv[ply] = [mv] + self.pv[ply + 1]
+                    if score >= beta:
+                        if quiet:
+                            order.cutoff(pos.color, mv, depth, ply, prev,
+                                         quiets[:-1])
+                        break
+
+        if not searched:
+            if movegen.king_attacked(pos, pos.color):
+                return -MATE + ply
+            return 0
+
+        if best >= beta:
+            bound = hashtable.LOWER
+        elif best > start_alpha:
+            bound = hashtable.EXACT
+        else:
+            bound = hashtable.UPPER
+            best_move = 0
+        table.store(pos.key, depth, best_move, _to_table(best, ply), bound)
+        return best
+
+    def _quiesce(self, alpha, beta, ply):
+        pos = self.pos
+        # NOTE: checked first since evasions recurse without standing pat
+        #       and the pv only has room for MAX_PLY + 2 plies
+        if ply >= MAX_PLY:
+            return evaluate.evaluate(pos)
+        self.pv[ply] = []
+        self.nodes += 1
+        if not self.nodes % CHECK_EVERY or self.node_limit is not None:
+            self._check_limits()
+        if self.stopped:
+            return 0
+
+        moves = []
+        if movegen.king_attacked(pos, pos.color):
+            # NOTE: standing pat is not an option in check, so every evasion
+            #       is searched and having none is mate
+            movegen.get_legal_moves(pos, moves)
+            if not moves:
+                return -MATE + ply
+            best = -INFINITY
+            stand = None
+        else:
+            best = stand = evaluate.evaluate(pos)
+            if stand >= beta:
+                return stand
+            if stand > alpha:
+                alpha = stand
+            movegen.get_legal_moves(pos, moves, movegen.NOISY)
+        for mv in ordering.sort_captures(pos, moves):
+            if stand is not None:
+                # NOTE: skip captures that can't raise alpha even if they
+                #       win their victim outright, and captures that lose
+                #       material on the exchange
+                prm = move.promotion(mv)
+                gain = see.VALUES[pos.squares[move.tosq(mv)] or piece.PAWN]
+                if prm and prm != piece.PAWN:
+                    gain += see.VALUES[prm] - see.VALUES[piece.PAWN]
+                if stand + gain + DELTA_MARGIN <= alpha:
+                    continue
+                if see.see(pos, mv) < 0:
+                    continue
+            pos.make_move(mv)
+            score = -self._quiesce(-beta, -alpha, ply + 1)
+            pos.unmake_move()
+            if self.stopped:
+                return 0
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if score >= beta:
+                        break
+        return best
+
+
+def info(result):
+    score = result.score
+    if score > MATE_BOUND:
+        score = 'mate %d' % ((MATE - score + 1) // 2)
+    elif score < -MATE_BOUND:
+        score = 'mate -%d' % ((MATE + score) // 2)
+    else:
+        score = 'cp %d' % score
+    return 'info depth %d score %s nodes %d nps %d time %d pv %s' % (
+        result.depth, score, result.nodes, result.nps,
+        result.time * 1000, ' '.join(move.uci(mv) for mv in result.pv))
+
+
+def _info(result):
+    print info(result)
+    sys.stdout.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ivory.search',
+        description='Search a position and print the best move.')
+    parser.add_argument('fen', nargs='?', default=position.Position().fen,
+                        help='position to search (default: start)')
+    parser.add_argument('-d', '--depth', type=int, default=None,
+                        help='stop after this many plies')
+    parser.add_argument('-n', '--nodes', type=int, default=None,
+                        help='stop after this many nodes')
+    parser.add_argument('-t', '--movetime', type=float, default=None,
+                        help='stop after this many seconds')
+    parser.add_argument('--hash-mb', type=int, default=16,
+                        help='size of the transposition table')
+    args = parser.parse_args(argv)
+    if args.depth is None and args.nodes is None and args.movetime is None:
+        args.depth = 4
+
+    searcher = Search(position.Position(args.fen), hash_mb=args.hash_mb)
+    result = searcher.search(args.depth, args.nodes, args.movetime, _info)
+    print 'bestmove %s' % (move.uci(result.move) if result.move else '0000')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from ivory import move
+from ivory import movegen
+from ivory import piece
+from ivory import square
+
+
+VALUES = (0, 100, 300, 300, 500, 900, 20000)
+
+
+def see(pos, mv):
+    frsq = move.frsq(mv)
+    tosq = move.tosq(mv)
+    pc = move.piece(mv)
+    prm = move.promotion(mv)
+    if prm == piece.KING:
+        return 0
+    occupied = pos.occupied
+    if prm == piece.PAWN:
+        captured = piece.PAWN
+        occupied ^= square.BITS[tosq - 8 if pos.color else tosq + 8]
+    else:
+        captured = pos.squares[tosq]
+    gain = [VALUES[captured]]
+    if prm and prm != piece.PAWN:
+        gain[0] += VALUES[prm] - VALUES[piece.PAWN]
+        pc = prm
+
+    piece_bbs = pos.piece_bbs
+    color_bbs = pos.color_bbs
+    queens = piece_bbs[piece.QUEEN]
+    diagonal = piece_bbs[piece.BISHOP] | queens
+    straight = piece_bbs[piece.ROOK] | queens
+    attackers = movegen.attackers_to(pos, tosq, occupied)
+    frbit = square.BITS[frsq]
+    cl = pos.color
+    while True:
+        # NOTE: gain[-1] is what the side that just captured would lose if
+        #       its piece on tosq is taken back
+        gain.append(VALUES[pc] - gain[-1])
+        occupied ^= frbit
+        if pc != piece.KNIGHT and pc != piece.KING:
+            # NOTE: lifting the piece may uncover a slider behind it
+            attackers |= (
+                (movegen.slider_attacks(piece.BISHOP, tosq, occupied) &
+                 diagonal) |
+                (movegen.slider_attacks(piece.ROOK, tosq, occupied) &
+                 straight))
+        attackers &= occupied
+        cl = not cl
+        own = attackers & color_bbs[cl]
+        if not own:
+            break
+        for pc in (piece.PAWN, piece.KNIGHT, piece.BISHOP, piece.ROOK,
+                   piece.QUEEN, piece.KING):
+            frbit = own & piece_bbs[pc]
+            if frbit:
+                break
+        if pc == piece.KING and attackers & color_bbs[not cl]:
+            # NOTE: the king can't take back into a defended square
+            break
+        frbit &= -frbit
+
+    # NOTE: the last entry is a capture nobody was left to answer
+    gain.pop()
+    while len(gain) > 1:
+        last = gain.pop()
+        gain[-1] = -max(-gain[-1], last)
+    return gain[0]
@@ -19,24 +19,30 @@
 FILES = 'abcdefgh'
 RANKS = '12345678'
 SQUARES = [f + r for r in RANKS for f in FILES]
-INTS = [1L << i for i in xrange(64)]
-BIT_FILES = [sum(INTS[x::8]) for x in xrange(8)]
-BIT_RANKS = [sum(INTS[x * 8:(x * 8) + 8]) for x in xrange(8)]
-BIT_A1H8 = ([sum(INTS[(7 - x) * 8::9]) for x in xrange(8)] +
-            [sum(INTS[x:(8 - x) * 8:9]) for x in xrange(1, 8)])
-BIT_A8H1 = ([sum(INTS[x:x * 8 + 1:7]) for x in xrange(8)] +
-            [sum(INTS[x * 8 + 7::7]) for x in xrange(1, 8)])
+NONE = 64
+INTS = range(64)
+# NOTE: BITS has an extra empty entry so BITS[NONE] is an empty bitboard
+BITS = [1L << i for i in INTS] + [0L]
+FILE = [i & 0x7 for i in INTS]
+RANK = [i >> 3 for i in INTS]
+A1H8 = [7 - RANK[i] + FILE[i] for i in INTS]
+A8H1 = [RANK[i] + FILE[i] for i in INTS]
+BIT_FILES = [sum(BITS[x:64:8]) for x in xrange(8)]
+BIT_RANKS = [sum(BITS[x * 8:(x * 8) + 8]) for x in xrange(8)]
+BIT_A1H8 = ([sum(BITS[(7 - x) * 8:64:9]) for x in xrange(8)] +
+            [sum(BITS[x:(8 - x) * 8:9]) for x in xrange(1, 8)])
+BIT_A8H1 = ([sum(BITS[x:x * 8 + 1:7]) for x in xrange(8)] +
+            [sum(BITS[x * 8 + 7:64:7]) for x in xrange(1, 8)])
 NOT_FIRST_FILE = ~(BIT_FILES[0])
 NOT_LAST_FILE = ~(BIT_FILES[-1])
 NOT_FIRST_TWO_FILES = ~(BIT_FILES[0] | BIT_FILES[1])
 NOT_LAST_TWO_FILES = ~(BIT_FILES[-2] | BIT_FILES[-1])
 SQUARE_TO_INT = dict(zip(SQUARES, INTS))
-SQUARE_TO_INT['-'] = 0L
-INT_TO_SQUARE = dict(zip(INTS, SQUARES))
-INT_TO_SQUARE[0L] = '-'
+SQUARE_TO_INT['-'] = NONE
+INT_TO_SQUARE = SQUARES + ['-']
 
 
-def sq(val=0L):
+def sq(val=NONE):
     if isinstance(val, basestring):
         val = _parse(val)
     return val
@@ -46,102 +52,110 @@ def str(sq):
     return INT_TO_SQUARE[sq]
 
 
-# NOTE(vish): mask is necessary for overflow
+def bit(sq):
+    return BITS[sq]
+
+
+def _step(sq, file_delta, rank_delta):
+    if sq == NONE:
+        return NONE
+    file = FILE[sq] + file_delta
+    rank = RANK[sq] + rank_delta
+    if 0 <= file < 8 and 0 <= rank < 8:
+        return rank * 8 + file
+    return NONE
+
+
 def n(sq):
-    return (sq << 8) & 0xFFFFFFFFFFFFFFFF
+    return _step(sq, 0, 1)
 
 
 def e(sq):
-    return (sq & NOT_LAST_FILE) << 1
+    return _step(sq, 1, 0)
 
 
 def s(sq):
-    return sq >> 8
+    return _step(sq, 0, -1)
 
 
 def w(sq):
-    return (sq & NOT_FIRST_FILE) >> 1
+    return _step(sq, -1, 0)
 
 
 def nn(sq):
-    return (sq << 16) & 0xFFFFFFFFFFFFFFFF
+    return _step(sq, 0, 2)
 
 
 def ss(sq):
-    return sq >> 16
+    return _step(sq, 0, -2)
 
 
 def ne(sq):
-    return ((sq & NOT_LAST_FILE) << 9) & 0xFFFFFFFFFFFFFFFF
+    return _step(sq, 1, 1)
 
 
 def se(sq):
-    return (sq & NOT_LAST_FILE) >> 7
+    return _step(sq, 1, -1)
 
 
 def sw(sq):
-    return (sq & NOT_FIRST_FILE) >> 9
+    return _step(sq, -1, -1)
 
 
 def nw(sq):
-    return ((sq & NOT_FIRST_FILE) << 7) & 0xFFFFFFFFFFFFFFFF
+    return _step(sq, -1, 1)
 
 
 def nne(sq):
-    return ((sq & NOT_LAST_FILE) << 17) & 0xFFFFFFFFFFFFFFFF
+    return _step(sq, 1, 2)
 
 
 def ene(sq):
-    return ((sq & NOT_LAST_TWO_FILES) << 10) & 0xFFFFFFFFFFFFFFFF
+    return _step(sq, 2, 1)
 
 
 def ese(sq):
-    return (sq & NOT_LAST_TWO_FILES) >> 6
+    return _step(sq, 2, -1)
 
 
 def sse(sq):
-    return (sq & NOT_LAST_FILE) >> 15
+    return _step(sq, 1, -2)
 
 
 def ssw(sq):
-    return (sq & NOT_FIRST_FILE) >> 17
+    return _step(sq, -1, -2)
 
 
 def wsw(sq):
-    return (sq & NOT_FIRST_TWO_FILES) >> 10
+    return _step(sq, -2, -1)
 
 
 def wnw(sq):
-    return ((sq & NOT_FIRST_TWO_FILES) << 6) & 0xFFFFFFFFFFFFFFFF
+    return _step(sq, -2, 1)
 
 
 def nnw(sq):
-    return ((sq & NOT_FIRST_FILE) << 15) & 0xFFFFFFFFFFFFFFFF
-
-
-def index(sq):
-    return INTS.index(sq)
+    return _step(sq, -1, 2)
 
 
 def file(sq):
-    return index(sq) & 0x7
+    return FILE[sq]
 
 
 def rank(sq):
-    return index(sq) >> 3
+    return RANK[sq]
 
 
 def a1h8(sq):
-    return 7 - rank(sq) + file(sq)
+    return A1H8[sq]
 
 
 def a8h1(sq):
-    return rank(sq) + file(sq)
+    return A8H1[sq]
 
 
 def all():
-    for i in INTS:
-        yield i
+    return iter(INTS)
 
 
 def _parse(val):
@@ -150,21 +164,17 @@ def _parse(val):
     return SQUARE_TO_INT[val]
 
 
-def from_index(index):
-    return INTS[index]
-
-
 def from_a8(rank, file):
-    return INTS[(7 - rank) * 8 + file]
+    return (7 - rank) * 8 + file
 
 
 def from_a1(rank, file):
-    return INTS[rank * 8 + file]
+    return rank * 8 + file
 
 
 def walk(sq, dir):
     glob = globals()
     sq = glob.get(dir)(sq)
-    while sq:
+    while sq != NONE:
         yield sq
         sq = glob.get(dir)(sq)
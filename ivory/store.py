@@ -0,0 +1,199 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import heapq
+import itertools
+import mmap
+import operator
+import os
+import struct
+
+from ivory import position
+
+
+VERSION = 1
+SIGNATURE = 'IVP1'
+HEADER = struct.Struct('<4sIQ')
+# NOTE: records are the zobrist key followed by the packed position, and
+#       are sorted by key so lookups can bisect the mapped file
+RECORD = struct.Struct('<Q%ds' % position.PACKED.size)
+KEY = struct.Struct('<Q')
+# NOTE: write sorts this many records in memory at a time
+CHUNK_RECORDS = 1 << 18
+# NOTE: and merges at most this many sorted runs at a time
+MERGE_RUNS = 64
+
+
+def _pairs(positions):
+    for pos in positions:
+        if isinstance(pos, position.Position):
+            yield pos.key, pos.to_bytes()
+        else:
+            yield pos
+
+
+def _unique(records):
+    # NOTE: records must already be in key order with the earliest of
+    #       each key first, as a stable sort leaves them
+    for key, group in itertools.groupby(records, operator.itemgetter(0)):
+        yield next(group)
+
+
+def encode(positions):
+    # NOTE: positions may be Position objects or (key, packed) pairs. The
+    #       first of each key is kept, since the sort is stable.
+    return list(_unique(sorted(_pairs(positions),
+                               key=operator.itemgetter(0))))
+
+
+def _spill(records, tmp, files):
+    path = '%s.%d' % (tmp, len(files))
+    files.append(path)
+    with open(path, 'wb') as f:
+        for key, data in records:
+            f.write(RECORD.pack(key, data))
+    return path
+
+
+def _run(path, index):
+    # NOTE: tagged with the run index so the merge breaks ties by input
+    #       order without ever comparing the packed data
+    with open(path, 'rb') as f:
+        while True:
+            record = f.read(RECORD.size)
+            if not record:
+                break
+            key, data = RECORD.unpack(record)
+            yield key, index, data
+
+
+def _merge(paths):
+    runs = [_run(path, index) for index, path in enumerate(paths)]
+    return _unique((key, data)
+                   for key, index, data in heapq.merge(*runs))
+
+
+def _chunks(positions, size):
+    pairs = _pairs(positions)
+    while True:
+        chunk = encode(itertools.islice(pairs, size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def write(path, positions, chunk_records=CHUNK_RECORDS,
+          merge_runs=MERGE_RUNS):
+    # NOTE: input is sorted in chunks of chunk_records. If there is more
+    #       than one chunk, each is spilled to a run file next to path and
+    #       the runs are merged, so memory stays bounded by the chunk size.
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    chunks = _chunks(positions, chunk_records)
+    records = next(chunks, [])
+    files = []
+    try:
+        later = next(chunks, None)
+        if later is not None:
+            runs = [_spill(chunk, tmp, files)
+                    for chunk in itertools.chain([records, later], chunks)]
+            # NOTE: neighbouring runs are merged in passes, which keeps
+            #       their order and at most merge_runs files open at once
+            while len(runs) > merge_runs:
+                merged = []
+                for i in xrange(0, len(runs), merge_runs):
+                    group = runs[i:i + merge_runs]
+                    merged.append(_spill(_merge(group), tmp, files))
+                    for run in group:
+                        os.unlink(run)
+                runs = merged
+            records = _merge(runs)
+        count = 0
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(SIGNATURE, VERSION, 0))
+            for key, data in records:
+                f.write(RECORD.pack(key, data))
+                count += 1
+            f.seek(0)
+            f.write(HEADER.pack(SIGNATURE, VERSION, count))
+        os.rename(tmp, path)
+    finally:
+        for name in files + [tmp]:
+            if os.path.exists(name):
+                os.unlink(name)
+    return count
+
+
+class PositionFile(object):
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER.size:
+            raise ValueError('%s is too short for a position file' % path)
+        sig, version, count = HEADER.unpack_from(self.data)
+        if sig != SIGNATURE or version != VERSION:
+            raise ValueError('%s is not a position file' % path)
+        if len(self.data) != HEADER.size + count * RECORD.size:
+            raise ValueError('%s is truncated' % path)
+        self.count = count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.data.close()
+
+    def __len__(self):
+        return self.count
+
+    def _key(self, i):
+        return KEY.unpack_from(self.data, HEADER.size + i * RECORD.size)[0]
+
+    def _find(self, key):
+        lo = 0
+        hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key(lo) == key:
+            return lo
+        return None
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        if i is None:
+            return default
+        return RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)[1]
+
+    def position(self, key):
+        data = self.get(key)
+        if data is None:
+            raise KeyError(key)
+        return position.Position.from_bytes(data)
+
+    def __iter__(self):
+        for i in xrange(self.count):
+            yield RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
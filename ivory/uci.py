@@ -0,0 +1,270 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import argparse
+import sys
+import threading
+import time
+
+import ivory
+from ivory import hashtable
+from ivory import move
+from ivory import position
+from ivory import search
+
+
+# NOTE: without movestogo the clock is shared out as if this many moves
+#       were left, and OVERHEAD seconds are kept back for lag
+MOVES_TO_GO = 30
+OVERHEAD = 0.05
+MIN_TIME = 0.01
+# NOTE: seconds between the info lines sent while an iteration runs
+REPORT_EVERY = 1.0
+GO_PARAMS = ('depth', 'nodes', 'movetime', 'wtime', 'btime', 'winc', 'binc',
+             'movestogo')
+
+
+def budget(time_left, inc=0, movestogo=None):
+    # NOTE: times are in milliseconds as the gui sends them, the budget
+    #       is in seconds as search expects it
+    time_left /= 1000.0
+    inc /= 1000.0
+    share = time_left / (movestogo or MOVES_TO_GO) + inc * 0.75
+    return max(min(share, time_left - OVERHEAD), MIN_TIME)
+
+
+class Engine(object):
+    # NOTE: commands are read on the caller's thread and each go starts a
+    #       search thread, so isready, stop and ponderhit are answered
+    #       while it runs. Output from both threads goes through send.
+    def __init__(self, out=None, hash_mb=16):
+        self.out = out or sys.stdout
+        self.lock = threading.Lock()
+        self.pos = position.Position()
+        self.searcher = search.Search(self.pos, hash_mb=hash_mb)
+        self.thread = None
+        self.timer = None
+        self.limit = None
+        # NOTE: an infinite or ponder search holds its bestmove until this
+        #       is set by stop or ponderhit
+        self.release = threading.Event()
+
+    def send(self, line):
+        with self.lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def handle(self, line):
+        words = line.split()
+        if not words:
+            return True
+        command = getattr(self, 'do_' + words[0], None)
+        if command is None:
+            self.send('info string unknown command %s' % words[0])
+            return True
+        return command(words[1:]) is not False
+
+    def run(self, lines):
+        for line in lines:
+            if not self.handle(line):
+                break
+        self.wait()
+
+    @property
+    def searching(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def wait(self):
+        if self.searching:
+            self.release.set()
+            self.searcher.stop()
+            self.thread.join()
+        self.thread = None
+
+    def do_uci(self, args):
+        self.send('id name ivory %s' % ivory.__version__)
+        self.send('id author Vishvananda Ishaya')
+        self.send('option name Hash type spin default 16 min 1 max 4096')
+        self.send('uciok')
+
+    def do_isready(self, args):
+        self.send('readyok')
+
+    def do_debug(self, args):
+        pass
+
+    def do_setoption(self, args):
+        line = ' '.join(args)
+        name, _, value = line.partition(' value ')
+        name = name.replace('name', '', 1).strip().lower()
+        if name == 'hash':
+            self.wait()
+            try:
+                self.searcher.table = hashtable.SearchTable(int(value))
+            except ValueError:
+                self.send('info string bad hash size %s' % value)
+        else:
+            self.send('info string unknown option %s' % name)
+
+    def do_ucinewgame(self, args):
+        self.wait()
+        self.searcher.table.clear()
+        self.searcher.order.clear()
+
+    def do_position(self, args):
+        self.wait()
+        if 'moves' in args:
+            index = args.index('moves')
+            args, moves = args[:index], args[index + 1:]
+        else:
+            moves = []
+        # NOTE: built on a new position so a bad move leaves the last
+        #       good one in place for the next go
+        try:
+            if args[:1] == ['startpos']:
+                pos = position.Position()
+            elif args[:1] == ['fen']:
+                pos = position.Position(' '.join(args[1:]))
+            else:
+                raise ValueError('expected startpos or fen')
+            for text in moves:
+                pos.make_move(pos.parse_uci(text))
+        except ValueError, e:
+            self.send('info string bad position: %s' % e)
+            return
+        self.pos = self.searcher.pos = pos
+
+    def do_go(self, args):
+        self.wait()
+        params = {}
+        ponder = infinite = False
+        words = iter(args)
+        for word in words:
+            if word == 'ponder':
+                ponder = True
+            elif word == 'infinite':
+                infinite = True
+            elif word in GO_PARAMS:
+                try:
+                    params[word] = int(next(words))
+                except (StopIteration, ValueError):
+                    self.send('info string bad value for %s' % word)
+        limit = None
+        if 'movetime' in params:
+            limit = max(params['movetime'] / 1000.0 - OVERHEAD, MIN_TIME)
+        else:
+            side = 'w' if self.pos.color else 'b'
+            if side + 'time' in params:
+                limit = budget(params[side + 'time'],
+                               params.get(side + 'inc', 0),
+                               params.get('movestogo'))
+        if infinite:
+            limit = None
+        self.limit = limit
+        if ponder or infinite:
+            self.release.clear()
+        else:
+            self.release.set()
+        self.searcher.stopped = False
+        self.thread = threading.Thread(
+            target=self._search,
+            args=(params.get('depth'), params.get('nodes'),
+                  None if ponder else limit))
+        self.thread.daemon = True
+        self.thread.start()
+        if limit is not None and not ponder:
+            self._start_timer(limit)
+
+    def do_stop(self, args):
+        if self.searching:
+            self.release.set()
+            self.searcher.stop()
+
+    def do_ponderhit(self, args):
+        # NOTE: the opponent played the expected move, so the search goes
+        #       on as a normal timed one with the clock starting now
+        if self.searching:
+            if self.limit is not None:
+                self._start_timer(self.limit)
+            self.release.set()
+
+    def do_quit(self, args):
+        self.wait()
+        return False
+
+    def _start_timer(self, limit):
+        # NOTE: search only looks at the clock every few thousand nodes,
+        #       so a timer stops it right on the deadline
+        self._cancel_timer()
+        self.timer = threading.Timer(limit, self.searcher.stop)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _report(self, done):
+        # NOTE: iterations get long at depth, so send progress in between
+        searcher = self.searcher
+        while not done.wait(REPORT_EVERY):
+            elapsed = time.time() - searcher.start
+            self.send('info nodes %d nps %d time %d' % (
+                searcher.nodes, searcher.nodes / elapsed if elapsed else 0,
+                elapsed * 1000))
+
+    def _info(self, result):
+        self.send(search.info(result))
+
+    def _search(self, depth, nodes, movetime):
+        done = threading.Event()
+        reporter = threading.Thread(target=self._report, args=(done,))
+        reporter.daemon = True
+        reporter.start()
+        try:
+            result = self.searcher.search(depth, nodes, movetime,
+                                          self._info)
+        finally:
+            done.set()
+            reporter.join()
+        self.release.wait()
+        self._cancel_timer()
+        if not result.move:
+            self.send('bestmove 0000')
+        elif len(result.pv) > 1:
+            self.send('bestmove %s ponder %s' % (move.uci(result.move),
+                                                 move.uci(result.pv[1])))
+        else:
+            self.send('bestmove %s' % move.uci(result.move))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m ivory.uci',
+        description='Speak the UCI protocol on stdin and stdout.')
+    parser.add_argument('--hash-mb', type=int, default=16,
+                        help='size of the transposition table')
+    args = parser.parse_args(argv)
+    # NOTE: readline rather than iterating stdin, which reads ahead and
+    #       would hold commands back
+    Engine(hash_mb=args.hash_mb).run(iter(sys.stdin.readline, ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
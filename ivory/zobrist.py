@@ -0,0 +1,52 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import random
+
+from ivory import castle
+from ivory import piece
+from ivory import square
+
+
+# NOTE: a fixed seed keeps keys stable between runs and processes, so keys
+#       can be stored and compared across them.
+_rand = random.Random(0x1A0B7C)
+PIECES = [[[_rand.getrandbits(64) if pc else 0L for sq in square.all()]
+           for pc in xrange(len(piece.PIECES) + 1)]
+          for cl in xrange(2)]
+COLOR = _rand.getrandbits(64)
+_CASTLE_FLAGS = [_rand.getrandbits(64) for char in castle.CHARS]
+CASTLE = [reduce(lambda x, y: x ^ y,
+                 [k for i, k in enumerate(_CASTLE_FLAGS) if cst & (1 << i)],
+                 0L)
+          for cst in xrange(1 << len(castle.CHARS))]
+_FILES = [_rand.getrandbits(64) for file in square.FILES]
+EN_PASSANT = [_FILES[square.file(sq)] for sq in square.all()] + [0L]
+
+
+def key(pos):
+    out = 0L
+    for sq in square.all():
+        pc = pos.squares[sq]
+        if pc:
+            cl = int(bool(pos.color_bbs[1] & square.BITS[sq]))
+            out ^= PIECES[cl][pc][sq]
+    if not pos.color:
+        out ^= COLOR
+    out ^= CASTLE[pos.castle]
+    out ^= EN_PASSANT[pos.enp]
+    return out
@@ -27,6 +27,7 @@ config = {
     'author_email': 'vishvananda@gmail.com',
     'version': '0.1',
     'install_requires': ['nose'],
+    'extras_require': {'batch': ['numpy']},
     'packages': ['ivory'],
     'scripts': [],
     'name': 'ivory',
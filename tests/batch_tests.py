@@ -0,0 +1,124 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from ivory import batch
+from ivory import bitboard
+from ivory import movegen
+from ivory import piece
+from ivory import position
+from ivory import square
+
+
+FENS = (
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+)
+
+
+def _positions():
+    out = []
+    for fen in FENS:
+        pos = position.Position(fen)
+        out.append(pos.copy())
+        for mv in pos.legal_moves:
+            pos.make_move(mv)
+            out.append(pos.copy())
+            pos.unmake_move()
+    return out
+
+
+def _attacks(pos, cl, pc, sq):
+    if pc == piece.PAWN:
+        return movegen.PAWN_ATTACKS[cl][sq]
+    if pc == piece.QUEEN:
+        return (movegen.slider_attacks(piece.BISHOP, sq, pos.occupied) |
+                movegen.slider_attacks(piece.ROOK, sq, pos.occupied))
+    if pc in (piece.BISHOP, piece.ROOK):
+        return movegen.slider_attacks(pc, sq, pos.occupied)
+    return movegen.ATTACKS[pc][sq]
+
+
+@unittest.skipIf(batch.numpy is None, "numpy is not installed")
+class BatchBoardTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.positions = _positions()
+        self.batch = batch.BatchBoard.from_positions(self.positions)
+
+    def test_from_positions(self):
+        self.assertEqual(len(self.batch), len(self.positions))
+        for i, pos in enumerate(self.positions):
+            self.assertEqual(int(self.batch.occupied[i]), pos.occupied)
+            self.assertEqual(int(self.batch.color[i]), pos.color)
+            for pc in piece.all():
+                self.assertEqual(int(self.batch.pieces[pc][i]),
+                                 pos.piece_bbs[pc])
+
+    def test_popcount(self):
+        bbs = [0, 1, batch.FULL, batch.NOT_A, 1 << 63, 0x8100000000000081]
+        self.assertEqual(list(batch.popcount(bbs)),
+                         [bitboard.ones(bb) for bb in bbs])
+
+    def test_shifts(self):
+        occupied = self.batch.occupied
+        for name in ('n', 's', 'e', 'w', 'ne', 'nw', 'se', 'sw'):
+            shifted = getattr(batch, name)(occupied)
+            for i, pos in enumerate(self.positions):
+                self.assertEqual(int(shifted[i]),
+                                 getattr(bitboard, name)(pos.occupied))
+
+    def test_attacks(self):
+        for i, pos in enumerate(self.positions):
+            for cl in (0, 1):
+                for pc in piece.all():
+                    pieces = pos.piece_bbs[pc] & pos.color_bbs[cl]
+                    own = pos.color_bbs[cl]
+                    expected = 0
+                    moves = 0
+                    for sq in bitboard.squares(pieces):
+                        attacks = _attacks(pos, cl, pc, sq)
+                        expected |= attacks
+                        moves += bitboard.ones(attacks & ~own)
+                    self.assertEqual(int(self.batch.attacks(cl, pc)[i]),
+                                     expected)
+                    if pc != piece.PAWN:
+                        self.assertEqual(self.batch.mobility(cl, pc)[i],
+                                         moves)
+
+    def test_pawn_attack_spans(self):
+        spans = (self.batch.pawn_attack_spans(0),
+                 self.batch.pawn_attack_spans(1))
+        for i, pos in enumerate(self.positions):
+            for cl in (0, 1):
+                pawns = pos.piece_bbs[piece.PAWN] & pos.color_bbs[cl]
+                expected = 0
+                for sq in bitboard.squares(pawns):
+                    for tosq in square.all():
+                        ahead = (square.rank(tosq) > square.rank(sq) if cl
+                                 else square.rank(tosq) < square.rank(sq))
+                        if ahead and abs(square.file(tosq) -
+                                         square.file(sq)) == 1:
+                            expected |= square.BITS[tosq]
+                self.assertEqual(int(spans[cl][i]), expected)
+
+    def test_pawn_mobility(self):
+        self.assertRaises(ValueError, self.batch.mobility, 1, piece.PAWN)
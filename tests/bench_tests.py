@@ -0,0 +1,57 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import StringIO
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+from ivory import bench
+
+
+class BenchTestCase(unittest.TestCase):
+
+    def test_run(self):
+        name, fen, counts = bench.POSITIONS[1]
+        result = bench.run(name, fen, counts, 2)
+        self.assertTrue(result['ok'])
+        self.assertEqual(result['nodes'], 2039)
+        self.assertEqual(result['stats']['num_captures'], 351)
+
+    def test_micro(self):
+        results = bench.micro(2)
+        self.assertEqual([r['function'] for r in results],
+                         [name for name, old, new in bench.MICRO])
+        self.assertTrue(all(r['ok'] for r in results))
+
+    def test_main_writes_json(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        stdout = sys.stdout
+        sys.stdout = out = StringIO.StringIO()
+        try:
+            self.assertEqual(bench.main(['-d', '2', '-p', 'position3',
+                                         '-o', path]), 0)
+            with open(path) as f:
+                data = json.load(f)
+            self.assertEqual([r['nodes'] for r in data['results']], [14, 191])
+        finally:
+            sys.stdout = stdout
+            os.unlink(path)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
@@ -0,0 +1,93 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import StringIO
+import unittest
+
+from ivory import epd
+from ivory import position
+
+
+SUITE = """\
+# a comment, followed by a blank line
+
+1k1r4/pp1b1R2/3q2pp/4p3/2B5/4Q3/PPP2B2/2K5 b - - bm Qd1+; id "BK.01";
+rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - D1 20; D2 400; D3 8902;
+r3k2r/8/8/8/8/8/8/R3K2R w KQkq - hmvc 7; fmvn 30; am O-O-O Kd2; c0 "a; b";
+"""
+
+
+class EpdTestCase(unittest.TestCase):
+
+    def test_read(self):
+        records = list(epd.read(StringIO.StringIO(SUITE)))
+        self.assertEqual(len(records), 3)
+        first, second, third = records
+        self.assertEqual(first.id, 'BK.01')
+        self.assertEqual(first.best_moves, ['Qd1+'])
+        self.assertEqual(first.fen, "1k1r4/pp1b1R2/3q2pp/4p3/2B5/4Q3/"
+                         "PPP2B2/2K5 b - - 0 1")
+        self.assertEqual(second.perft, {1: 20, 2: 400, 3: 8902})
+        self.assertEqual(second.id, None)
+        self.assertEqual(third.fen, "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 7 30")
+        self.assertEqual(third.avoid_moves, ['O-O-O', 'Kd2'])
+        self.assertEqual(third.get('c0'), 'a; b')
+
+    def test_operations_are_lazy(self):
+        record = epd.Record('8/8/8/8/8/8/8/K6k w - - c0 "unterminated;')
+        self.assertEqual(record.fields[0], '8/8/8/8/8/8/8/K6k')
+        self.assertRaises(ValueError, lambda: record.operations)
+        self.assertRaises(ValueError, epd.Record, '8/8/8/8/8/8/8/K6k w -')
+
+    def test_load_skips_operations(self):
+        lines = ['8/8/8/8/8/8/8/K6k w - - c0 "unterminated; hmvc 3;',
+                 '8/8/8/8/8/8/8/K6k b - - id "x; hmvc 2"; hmvc 4; fmvn 9;',
+                 '8/8/8/8/8/8/8/K6k w - - fmvn x;']
+        seen = []
+        for pos, record in epd.load(lines):
+            self.assertEqual(record._operations, None)
+            seen.append(pos.fen)
+        self.assertEqual(seen, ['8/8/8/8/8/8/8/K6k w - - 0 1',
+                                '8/8/8/8/8/8/8/K6k b - - 4 9',
+                                '8/8/8/8/8/8/8/K6k w - - 0 1'])
+
+    def test_load_reuses_position(self):
+        pos = position.Position()
+        seen = []
+        for loaded, record in epd.load(StringIO.StringIO(SUITE), pos):
+            self.assertTrue(loaded is pos)
+            seen.append(loaded.fen)
+            if record.perft:
+                self.assertEqual(loaded.perft(1), record.perft[1])
+        self.assertEqual(seen, [record.fen for record in
+                                epd.read(StringIO.StringIO(SUITE))])
+
+    def test_dump_round_trip(self):
+        out = StringIO.StringIO()
+        records = list(epd.read(StringIO.StringIO(SUITE)))
+        count = epd.dump(out, ((pos, record.operations) for pos, record in
+                               epd.load(StringIO.StringIO(SUITE))))
+        self.assertEqual(count, 3)
+        dumped = list(epd.read(StringIO.StringIO(out.getvalue())))
+        for record, copy in zip(records, dumped):
+            self.assertEqual(copy.fields, record.fields)
+            self.assertEqual(copy.operations, record.operations)
+        pos = position.Position()
+        self.assertEqual(epd.format(pos, [('id', 'start pos'), ('D1', 20)]),
+                         position.Position().fen.rsplit(' ', 2)[0] +
+                         ' id "start pos"; D1 20;')
+
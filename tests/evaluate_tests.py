@@ -0,0 +1,73 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from ivory import evaluate
+from ivory import position
+
+
+KIWIPETE = ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R "
+            "w KQkq - 0 1")
+POSITION4 = ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 "
+             "w kq - 0 1")
+
+
+def _mirror(fen):
+    board, color, castle, enp, half, full = fen.split()
+    board = '/'.join(reversed(board.split('/'))).swapcase()
+    color = 'b' if color == 'w' else 'w'
+    castle = ''.join(sorted(castle.swapcase())) if castle != '-' else '-'
+    if enp != '-':
+        enp = enp[0] + ('6' if enp[1] == '3' else '3')
+    return ' '.join((board, color, castle, enp, half, full))
+
+
+class EvaluateTestCase(unittest.TestCase):
+
+    def _walk(self, pos, depth):
+        self.assertEqual((pos.mg, pos.eg, pos.phase), evaluate.scores(pos))
+        if depth == 0:
+            return
+        for mv in pos.legal_moves:
+            pos.make_move(mv)
+            self._walk(pos, depth - 1)
+            pos.unmake_move()
+
+    def test_scores_are_incremental(self):
+        for fen in (KIWIPETE, POSITION4):
+            self._walk(position.Position(fen), 2)
+
+    def test_start_position(self):
+        pos = position.Position()
+        self.assertEqual(pos.phase, evaluate.MAX_PHASE)
+        self.assertEqual(evaluate.evaluate(pos), 0)
+
+    def test_mirror_is_symmetric(self):
+        for fen in (KIWIPETE, POSITION4,
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"):
+            pos = position.Position(fen)
+            mirror = position.Position(_mirror(fen))
+            self.assertEqual(evaluate.evaluate(pos),
+                             evaluate.evaluate(mirror))
+
+    def test_material(self):
+        pos = position.Position("4k3/8/8/8/8/8/8/3QK3 w - - 0 1")
+        self.assertTrue(evaluate.evaluate(pos) > 800)
+        pos = position.Position("4k3/8/8/8/8/8/8/3QK3 b - - 0 1")
+        self.assertTrue(evaluate.evaluate(pos) < -800)
+        self.assertEqual(pos.phase, evaluate.PHASE_VALUES[5])
@@ -0,0 +1,60 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from ivory import hashtable
+
+
+class PerftTableTestCase(unittest.TestCase):
+
+    def test_probe_and_store(self):
+        table = hashtable.PerftTable(1)
+        self.assertEqual(table.probe(1234, 3), None)
+        table.store(1234, 3, 5000)
+        self.assertEqual(table.probe(1234, 3), 5000)
+        self.assertEqual(table.probe(1234, 2), None)
+        self.assertEqual(table.hits, 1)
+        self.assertEqual(table.probes, 3)
+
+    def test_replaces_shallowest(self):
+        table = hashtable.PerftTable(1)
+        step = table.mask + 1
+        for i in xrange(table.BUCKET):
+            table.store(7 + i * step, i + 2, i)
+        table.store(7 + table.BUCKET * step, 9, 99)
+        self.assertEqual(table.probe(7, 2), None)
+        self.assertEqual(table.probe(7 + step, 3), 1)
+        self.assertEqual(table.probe(7 + table.BUCKET * step, 9), 99)
+
+    def test_size(self):
+        table = hashtable.PerftTable(1)
+        self.assertTrue(len(table) * table.ENTRY_SIZE <= 1 << 20)
+        self.assertEqual(len(table) % table.BUCKET, 0)
+
+
+class SearchTableTestCase(unittest.TestCase):
+
+    def test_probe_and_store(self):
+        table = hashtable.SearchTable(1)
+        self.assertEqual(table.probe(1234), None)
+        table.store(1234, 3, 77, -50, hashtable.UPPER)
+        self.assertEqual(table.probe(1234), (77, -50, 3, hashtable.UPPER))
+        table.store(1234, 4, 0, 20, hashtable.UPPER)
+        self.assertEqual(table.probe(1234), (77, 20, 4, hashtable.UPPER))
+        table.store(1234, 0, 0, 20, hashtable.EXACT)
+        self.assertEqual(table.probe(1234)[2], 0)
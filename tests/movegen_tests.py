@@ -0,0 +1,170 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from ivory import magic
+from ivory import move
+from ivory import movegen
+from ivory import piece
+from ivory import position
+from ivory import square
+
+
+PERFT = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902]),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039]),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812]),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264]),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486]),
+]
+
+
+EDGE_CASES = [
+    # en passant would expose the king along the rank
+    "8/8/8/K2pP2r/8/8/8/7k w - d6 0 1",
+    # en passant removes the checking pawn
+    "8/8/8/3pP3/4K3/8/8/7k w - d6 0 1",
+    # double check
+    "4k3/8/8/8/1b6/8/4r3/4K2R w K - 0 1",
+    # pinned pawn can only capture the pinner
+    "4k3/8/8/1b6/8/3P4/8/5K2 w - - 0 1",
+    # king cannot retreat along the checking ray
+    "4k3/8/8/8/8/8/8/r3K3 w - - 0 1",
+]
+
+
+class MagicTestCase(unittest.TestCase):
+
+    def test_attacks_match_slide_attacks(self):
+        rand = random.Random(0)
+        for pc in (piece.BISHOP, piece.ROOK):
+            for sq in square.all():
+                for i in xrange(64):
+                    occ = rand.getrandbits(64) & rand.getrandbits(64)
+                    self.assertEqual(magic.attacks(pc, sq, occ),
+                                     magic.slide_attacks(pc, sq, occ))
+
+    def test_find_magic(self):
+        rand = random.Random(0)
+        sq = square.sq('d4')
+        mul = magic.find_magic(piece.BISHOP, sq, rand)
+        mask = magic.MASKS[piece.BISHOP][sq]
+        shift = magic.SHIFTS[piece.BISHOP][sq]
+        seen = {}
+        for occ in magic.subsets(mask):
+            idx = ((occ * mul) & magic.FULL) >> shift
+            att = magic.slide_attacks(piece.BISHOP, sq, occ)
+            self.assertEqual(seen.setdefault(idx, att), att)
+
+    def test_table_cache(self):
+        cache_dir = magic.CACHE_DIR
+        magic.CACHE_DIR = tempfile.mkdtemp()
+        try:
+            path = magic.cache_path(piece.BISHOP)
+            built = list(magic.load(piece.BISHOP))
+            self.assertTrue(os.path.exists(path))
+            self.assertEqual(list(magic.load(piece.BISHOP)), built)
+
+            with open(path, 'r+b') as f:
+                f.seek(-8, os.SEEK_END)
+                f.write('\xff' * 8)
+            self.assertEqual(magic._read(path, piece.BISHOP), None)
+            self.assertEqual(list(magic.load(piece.BISHOP)), built)
+            self.assertNotEqual(magic._read(path, piece.BISHOP), None)
+        finally:
+            shutil.rmtree(magic.CACHE_DIR)
+            magic.CACHE_DIR = cache_dir
+
+    def test_perft(self):
+        for fen, counts in PERFT:
+            pos = position.Position(fen)
+            pos.zero_stats()
+            for depth, nodes in enumerate(counts, 1):
+                self.assertEqual(pos.perft(depth), nodes)
+
+
+class LegalMovesTestCase(unittest.TestCase):
+
+    def _pseudo_legal(self, pos):
+        legal = set()
+        for mv in pos.pseudo_moves:
+            pos.make_move(mv)
+            if not movegen.king_attacked(pos, not pos.color):
+                legal.add(mv)
+            pos.unmake_move()
+        return legal
+
+    def _compare(self, pos, depth):
+        moves = []
+        movegen.get_legal_moves(pos, moves)
+        self.assertEqual(len(moves), len(set(moves)))
+        self.assertEqual(set(moves), self._pseudo_legal(pos), pos.fen)
+        noisy = []
+        movegen.get_legal_moves(pos, noisy, movegen.NOISY)
+        quiet = []
+        movegen.get_legal_moves(pos, quiet, movegen.QUIET)
+        self.assertEqual(sorted(noisy + quiet), sorted(moves))
+        for mv in noisy:
+            self.assertTrue(pos.is_capture(mv) or move.promotion(mv))
+        for mv in quiet:
+            self.assertFalse(pos.is_capture(mv))
+        if depth > 1:
+            for mv in moves:
+                pos.make_move(mv)
+                self._compare(pos, depth - 1)
+                pos.unmake_move()
+
+    def test_matches_filtered_pseudo_moves(self):
+        for fen, counts in PERFT:
+            self._compare(position.Position(fen), 2)
+
+    def _collect(self, pos, depth, seen):
+        moves = pos.legal_moves
+        seen.update(moves)
+        if depth > 1:
+            for mv in moves:
+                pos.make_move(mv)
+                self._collect(pos, depth - 1, seen)
+                pos.unmake_move()
+
+    def test_is_legal(self):
+        candidates = set()
+        for fen, counts in PERFT:
+            self._collect(position.Position(fen), 2, candidates)
+        for fen in EDGE_CASES:
+            self._collect(position.Position(fen), 1, candidates)
+        for fen in [fen for fen, counts in PERFT] + EDGE_CASES:
+            pos = position.Position(fen)
+            legal = set(pos.legal_moves)
+            for mv in candidates:
+                self.assertEqual(movegen.is_legal(pos, mv), mv in legal,
+                                 "%s %s%s" % (fen, square.str(move.frsq(mv)),
+                                              square.str(move.tosq(mv))))
+
+    def test_pins_checks_and_en_passant(self):
+        for fen in EDGE_CASES:
+            self._compare(position.Position(fen), 1)
@@ -0,0 +1,75 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from ivory import move
+from ivory import movepick
+from ivory import piece
+from ivory import position
+from ivory import square
+
+
+KIWIPETE = ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R "
+            "w KQkq - 0 1")
+
+
+class MovePickTestCase(unittest.TestCase):
+
+    def _mv(self, pc, frsq, tosq):
+        return move.mv(pc, square.sq(frsq), square.sq(tosq))
+
+    def _walk(self, pos, depth, others):
+        legal = pos.legal_moves
+        for hash_move in [0] + legal[:3] + others[:2]:
+            killers = (others + legal)[-2:]
+            picked = list(movepick.moves(pos, hash_move, killers))
+            self.assertEqual(len(picked), len(set(picked)))
+            self.assertEqual(set(picked), set(legal), pos.fen)
+            if hash_move in legal:
+                self.assertEqual(picked[0], hash_move)
+        if depth > 1:
+            for mv in legal:
+                pos.make_move(mv)
+                self._walk(pos, depth - 1, legal)
+                pos.unmake_move()
+
+    def test_yields_every_legal_move_once(self):
+        self._walk(position.Position(KIWIPETE), 2, [])
+
+    def test_stage_order(self):
+        pos = position.Position(KIWIPETE)
+        hash_move = move.mv(piece.KING, square.sq('e1'), square.sq('g1'),
+                            piece.KING)
+        killer = self._mv(piece.PAWN, 'a2', 'a3')
+        picked = list(movepick.moves(pos, hash_move, (killer,)))
+        self.assertEqual(picked[0], hash_move)
+        # bishop takes bishop is the most valuable even trade
+        self.assertEqual(picked[1], self._mv(piece.BISHOP, 'e2', 'a6'))
+        winning = [self._mv(piece.PAWN, 'd5', 'e6'),
+                   self._mv(piece.PAWN, 'g2', 'h3')]
+        self.assertEqual(sorted(picked[2:4]), sorted(winning))
+        self.assertEqual(picked[4], killer)
+        # queen takes pawn is searched last
+        self.assertEqual(picked[-1], self._mv(piece.QUEEN, 'f3', 'h3'))
+        self.assertTrue(pos.is_capture(picked[-2]))
+
+    def test_no_quiets_until_needed(self):
+        pos = position.Position(KIWIPETE)
+        picker = movepick.moves(pos)
+        mv = picker.next()
+        self.assertTrue(pos.is_capture(mv))
@@ -0,0 +1,101 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from ivory import move
+from ivory import movepick
+from ivory import ordering
+from ivory import piece
+from ivory import position
+from ivory import square
+
+
+KIWIPETE = ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R "
+            "w KQkq - 0 1")
+
+
+def _mv(pc, frsq, tosq):
+    return move.mv(pc, square.sq(frsq), square.sq(tosq))
+
+
+class OrderingTestCase(unittest.TestCase):
+
+    def test_sort_quiets_packs_scores(self):
+        # NOTE: scores are packed above the moves, so negative scores and
+        #       large move encodings must still come back intact
+        order = ordering.Ordering()
+        promotion = move.mv(piece.PAWN, square.sq('a7'), square.sq('b8'),
+                            piece.QUEEN)
+        low = _mv(piece.PAWN, 'a2', 'a3')
+        high = _mv(piece.KNIGHT, 'g1', 'f3')
+        order.history[1][ordering._index(promotion)] = -5
+        order.history[1][ordering._index(high)] = 7
+        self.assertEqual(order.sort_quiets(1, [promotion, low, high]),
+                         [high, low, promotion])
+
+    def test_sort_captures(self):
+        pos = position.Position(KIWIPETE)
+        captures = [_mv(piece.QUEEN, 'f3', 'h3'),
+                    _mv(piece.PAWN, 'g2', 'h3'),
+                    _mv(piece.QUEEN, 'f3', 'f6'),
+                    _mv(piece.BISHOP, 'e2', 'a6')]
+        self.assertEqual(ordering.sort_captures(pos, captures),
+                         [captures[3], captures[2], captures[1], captures[0]])
+
+    def test_cutoff(self):
+        order = ordering.Ordering(8)
+        prev = _mv(piece.PAWN, 'e7', 'e5')
+        first = _mv(piece.KNIGHT, 'g1', 'f3')
+        second = _mv(piece.PAWN, 'd2', 'd4')
+        tried = _mv(piece.PAWN, 'a2', 'a3')
+        order.cutoff(1, first, 3, 2, prev, [tried])
+        order.cutoff(1, second, 2, 2, prev, [])
+        self.assertEqual(order.killers[2], [second, first])
+        self.assertEqual(order.killers[3], [0, 0])
+        self.assertEqual(order.countermove(prev), second)
+        self.assertEqual(order.sort_quiets(1, [tried, second, first]),
+                         [first, second, tried])
+        self.assertEqual(order.history[0], [0] * 4096)
+        order.age()
+        self.assertEqual(order.sort_quiets(1, [tried, second, first]),
+                         [first, second, tried])
+        index = (square.sq('g1') << 6) | square.sq('f3')
+        self.assertEqual(order.history[1][index], 4)
+
+    def test_history_is_aged_at_the_limit(self):
+        order = ordering.Ordering()
+        mv = _mv(piece.KNIGHT, 'g1', 'f3')
+        for i in xrange(ordering.HISTORY_LIMIT // 64 + 1):
+            order.cutoff(1, mv, 8, 0, 0, [])
+        index = (square.sq('g1') << 6) | square.sq('f3')
+        self.assertTrue(order.history[1][index] < ordering.HISTORY_LIMIT)
+
+    def test_picker_uses_countermove_and_history(self):
+        pos = position.Position(KIWIPETE)
+        order = ordering.Ordering()
+        prev = _mv(piece.PAWN, 'h4', 'h3')
+        counter = _mv(piece.KING, 'e1', 'f1')
+        favourite = _mv(piece.ROOK, 'h1', 'g1')
+        killer = _mv(piece.PAWN, 'a2', 'a3')
+        order.cutoff(1, favourite, 4, 5, 0, [])
+        order.cutoff(1, counter, 1, 6, prev, [])
+        picked = list(movepick.moves(pos, 0, (killer,), order, prev))
+        quiet = [mv for mv in picked if movepick.is_quiet(pos, mv)]
+        self.assertEqual(quiet[:4], [killer, counter, favourite,
+                                     quiet[3]])
+        self.assertEqual(len(quiet), len(set(quiet)))
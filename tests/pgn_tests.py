@@ -0,0 +1,152 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import tempfile
+import unittest
+
+from ivory import move
+from ivory import pgn
+from ivory import piece
+from ivory import position
+from ivory import square
+from ivory import store
+
+
+GAMES = r'''[Event "Paris"]
+[Site "Paris FRA"]
+[White "Paul Morphy"]
+[Black "Duke Karl / Count Isouard"]
+[Result "1-0"]
+
+1. e4 e5 2. Nf3 d6 3. d4 Bg4 {This is a weak move
+already.} 4. dxe5 Bxf3 5. Qxf3 dxe5 6. Bc4 Nf6 7. Qb3 Qe7 8. Nc3 c6 9. Bg5
+b5 $6 10. Nxb5! cxb5 11. Bxb5+ Nbd7 12. O-O-O Rd8 13. Rxd7 Rxd7 14. Rd1 Qe6
+15. Bxd7+ Nxd7 (15... Qxd7 16. Qb8+ (16. Bxf6) Qd8 17. Qxd8#) 16. Qb8+ Nxb8
+17. Rd8# 1-0
+
+[Event "Promotions"]
+[SetUp "1"]
+[FEN "4k3/1P6/8/3pP3/8/8/8/4K3 w - d6 0 1"]
+[Annotator "A \"quoted\" name"]
+
+1. exd6 Kd7 ; the king has to take
+2. b8=N+ Kxd6 *
+
+[Event "Broken"]
+
+1. e4 e5 2. Ke3 1/2-1/2
+'''
+MORPHY = ['e4', 'e5', 'Nf3', 'd6', 'd4', 'Bg4', 'dxe5', 'Bxf3', 'Qxf3',
+          'dxe5', 'Bc4', 'Nf6', 'Qb3', 'Qe7', 'Nc3', 'c6', 'Bg5', 'b5',
+          'Nxb5!', 'cxb5', 'Bxb5+', 'Nbd7', 'O-O-O', 'Rd8', 'Rxd7', 'Rxd7',
+          'Rd1', 'Qe6', 'Bxd7+', 'Nxd7', 'Qb8+', 'Nxb8', 'Rd8#']
+
+
+class TokenizeTestCase(unittest.TestCase):
+
+    def test_tokens(self):
+        lines = ['[Event "x"] 1. e4 {a\n', 'b} $1 (1. d4) e5; rest\n',
+                 '% escaped\n', '2... Nf6 *\n']
+        self.assertEqual(list(pgn.tokenize(lines)), [
+            (pgn.TAG, ('Event', 'x')), (pgn.MOVE, 'e4'),
+            (pgn.COMMENT, 'a\nb'), (pgn.NAG, 1), (pgn.OPEN, '('),
+            (pgn.MOVE, 'd4'), (pgn.CLOSE, ')'), (pgn.MOVE, 'e5'),
+            (pgn.COMMENT, 'rest'), (pgn.MOVE, 'Nf6'), (pgn.RESULT, '*')])
+
+    def test_read(self):
+        games = list(pgn.read(GAMES.splitlines(True)))
+        self.assertEqual(len(games), 3)
+        self.assertEqual(games[0].moves, MORPHY)
+        self.assertEqual(games[0].result, '1-0')
+        self.assertEqual(games[0].tags['Black'], 'Duke Karl / Count Isouard')
+        self.assertEqual(games[0].fen, pgn.START_FEN)
+        self.assertEqual(games[1].moves, ['exd6', 'Kd7', 'b8=N+', 'Kxd6'])
+        self.assertEqual(games[1].tags['Annotator'], 'A "quoted" name')
+        self.assertEqual(games[1].fen, "4k3/1P6/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        self.assertEqual(games[2].result, '1/2-1/2')
+
+
+class SanTestCase(unittest.TestCase):
+
+    def test_replay(self):
+        games = list(pgn.read(GAMES.splitlines(True)))
+        played = [mv for pos, mv in pgn.replay(games[0])]
+        self.assertEqual(len(played), len(MORPHY) + 1)
+        self.assertEqual(move.promotion(played[22]), piece.KING)
+        self.assertEqual(move.frsq(played[21]), square.sq('b8'))
+        pos = position.Position()
+        for pos, mv in pgn.replay(games[1], pos):
+            pass
+        self.assertEqual(pos.fen, "1N6/8/3k4/8/8/8/8/4K3 w - - 0 3")
+        self.assertRaises(ValueError, list, pgn.replay(games[2]))
+
+
+class ImportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, GAMES * 5)
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def _import(self, **kwargs):
+        items = []
+        count, errors = pgn.import_file(self.path, items.append, **kwargs)
+        self.assertEqual(count, len(items))
+        return items, errors
+
+    def test_games(self):
+        games, errors = self._import(chunk_size=100)
+        self.assertEqual(errors, 0)
+        self.assertEqual([game.moves for game in games],
+                         [game.moves for game in
+                          pgn.read(open(self.path).readlines())])
+
+    def test_games_without_event_tags(self):
+        text = ''.join(line for line in GAMES.splitlines(True)
+                       if not line.startswith('[Event')) * 20
+        with open(self.path, 'wb') as f:
+            f.write(text)
+        with open(self.path, 'rb') as f:
+            starts = set(pgn._boundary(f, offset)
+                         for offset in xrange(0, len(text), 500))
+        self.assertTrue(len(starts) > 10)
+        for start in starts - set([0, len(text)]):
+            self.assertEqual(text[start - 1:start + 1], '\n[')
+        games, errors = self._import(chunk_size=500)
+        self.assertEqual([game.moves for game in games],
+                         [game.moves for game in
+                          pgn.read(text.splitlines(True))])
+
+    def test_positions(self):
+        items, errors = self._import(chunk_size=300, workers=2,
+                                     positions=True)
+        self.assertEqual(errors, 5)
+        self.assertEqual(len(items), 5 * (len(MORPHY) + 1 + 5))
+        path = self.path + '.bin'
+        try:
+            self.assertEqual(store.write(path, items),
+                             len(MORPHY) + 1 + 5)
+            with store.PositionFile(path) as stored:
+                key, data = items[-1]
+                self.assertEqual(stored.position(key).fen,
+                                 "1N6/8/3k4/8/8/8/8/4K3 w - - 0 3")
+        finally:
+            os.unlink(path)
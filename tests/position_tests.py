@@ -0,0 +1,326 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import pickle
+import unittest
+
+from ivory import bitboard
+from ivory import move
+from ivory import movegen
+from ivory import piece
+from ivory import position
+from ivory import square
+from ivory import zobrist
+
+
+KIWIPETE = ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R "
+            "w KQkq - 0 1")
+
+CHECKS = [
+    KIWIPETE,
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "5k2/8/8/8/8/8/8/4K2R w K - 0 1",
+    "8/8/8/K2pP2q/8/8/8/7k w - d6 0 1",
+    "8/8/8/8/1k6/8/2P5/R3K3 w Q - 0 1",
+]
+
+
+class PositionTestCase(unittest.TestCase):
+
+    def _walk(self, pos, depth):
+        if depth == 0:
+            return
+        for mv in pos.pseudo_moves:
+            key = pos.key
+            pos.make_move(mv)
+            self.assertEqual(pos.key, zobrist.key(pos))
+            self._walk(pos, depth - 1)
+            pos.unmake_move()
+            self.assertEqual(pos.key, key)
+
+    def _check_walk(self, pos, depth):
+        for mv in pos.legal_moves:
+            check = pos.gives_check(mv)
+            pos.make_move(mv)
+            self.assertEqual(check, movegen.king_attacked(pos, pos.color),
+                             "%s %s" % (pos.fen, move.uci(mv)))
+            if depth > 1:
+                self._check_walk(pos, depth - 1)
+            pos.unmake_move()
+
+    def test_gives_check(self):
+        for fen in CHECKS:
+            self._check_walk(position.Position(fen), 2)
+
+    def test_annotated_moves(self):
+        pos = position.Position("6k1/5ppp/8/8/8/8/8/R2n2K1 w - - 0 1")
+        mate = move.mv(piece.ROOK, square.sq('a1'), square.sq('a8'))
+        self.assertTrue(pos.gives_mate(mate))
+        self.assertFalse(pos.gives_mate(move.mv(piece.ROOK, square.sq('a1'),
+                                                square.sq('d1'))))
+        annotated = dict((move.uci(mv), mv) for mv in pos.annotated_moves)
+        self.assertTrue(move.is_mate(annotated['a1a8']))
+        self.assertFalse(move.is_capture(annotated['a1a8']))
+        self.assertTrue(move.is_capture(annotated['a1d1']))
+        self.assertFalse(move.is_check(annotated['a1d1']))
+        self.assertEqual(move.str(pos.annotate(mate)), 'Ra8#')
+        self.assertNotIn(annotated['a1a8'], pos.legal_moves)
+
+    def test_key_is_incremental(self):
+        pos = position.Position(KIWIPETE)
+        self.assertEqual(pos.key, zobrist.key(pos))
+        self._walk(pos, 2)
+
+    def test_key_ignores_move_clocks(self):
+        pos = position.Position()
+        start = pos.key
+        for mv in ('g1f3', 'g8f6', 'f3g1', 'f6g8'):
+            pos.make_move([m for m in pos.pseudo_moves
+                           if move.uci(m) == mv][0])
+        self.assertEqual(pos.key, start)
+        self.assertNotEqual(pos.fen, position.Position().fen)
+
+    def test_key_includes_en_passant(self):
+        with_enp = position.Position(
+            "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2")
+        without_enp = position.Position(
+            "rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+        self.assertNotEqual(with_enp.key, without_enp.key)
+
+    def _play(self, pos, *moves):
+        for name in moves:
+            for mv in pos.legal_moves:
+                if move.uci(mv) == name:
+                    pos.make_move(mv)
+                    break
+            else:
+                self.fail('illegal move %s' % name)
+
+    def test_repetition(self):
+        pos = position.Position()
+        shuffle = ('g1f3', 'g8f6', 'f3g1', 'f6g8')
+        self._play(pos, *shuffle[:3])
+        self.assertFalse(pos.is_repetition())
+        self._play(pos, shuffle[3])
+        self.assertTrue(pos.is_repetition())
+        pos.unmake_move()
+        self.assertFalse(pos.is_repetition())
+
+    def test_undo_stack_is_per_instance_and_grows(self):
+        first = position.Position()
+        second = position.Position(KIWIPETE)
+        shuffle = ('g1f3', 'g8f6', 'f3g1', 'f6g8')
+        for i in xrange(first.UNDO_PLIES):
+            self._play(first, shuffle[i % 4])
+            self._play(second, ('e1d1', 'e8d8', 'd1e1', 'd8e8')[i % 4])
+        self.assertEqual(first.ply, first.UNDO_PLIES)
+        self._play(first, 'e2e4')
+        while first.ply:
+            first.unmake_move()
+        self.assertEqual(first.fen, position.Position().fen)
+        while second.ply:
+            second.unmake_move()
+        self.assertEqual(second.fen, KIWIPETE)
+
+    def test_copy(self):
+        pos = position.Position(KIWIPETE)
+        self._play(pos, 'e1g1')
+        copy = pos.copy()
+        self.assertEqual(copy.fen, pos.fen)
+        self.assertEqual(copy.key, pos.key)
+        self._play(copy, 'a8b8', 'e2a6')
+        self.assertEqual(pos.fen.split()[0],
+                         KIWIPETE.replace('R3K2R', 'R4RK1').split()[0])
+        copy.unmake_move()
+        copy.unmake_move()
+        copy.unmake_move()
+        self.assertEqual(copy.fen, KIWIPETE)
+        self.assertEqual(pos.ply, 1)
+
+    def test_snapshot(self):
+        for fen in (KIWIPETE, "8/8/8/3pP3/4K3/8/8/7k w - d6 0 61"):
+            pos = position.Position(fen)
+            snap = pos.snapshot()
+            self.assertEqual(hash(snap), hash(pos.snapshot()))
+            self.assertRaises(AttributeError, setattr, snap, 'key', 0)
+            restored = position.Position.from_snapshot(snap)
+            self.assertEqual(restored.fen, fen)
+            self.assertEqual(restored.squares, pos.squares)
+            self.assertEqual(restored.occupied, pos.occupied)
+            self.assertEqual((restored.key, restored.mg, restored.eg,
+                              restored.phase),
+                             (pos.key, pos.mg, pos.eg, pos.phase))
+            self.assertEqual(pickle.loads(pickle.dumps(snap, 2)), snap)
+            self.assertEqual(restored.perft(2), pos.perft(2))
+
+    def _packed_walk(self, pos, depth):
+        data = pos.to_bytes()
+        self.assertEqual(len(data), position.PACKED.size)
+        restored = position.Position.from_bytes(data)
+        self.assertEqual(restored.fen, pos.fen)
+        self.assertEqual((restored.key, restored.mg, restored.eg,
+                          restored.phase),
+                         (pos.key, pos.mg, pos.eg, pos.phase))
+        if depth:
+            for mv in pos.legal_moves:
+                pos.make_move(mv)
+                self._packed_walk(pos, depth - 1)
+                pos.unmake_move()
+
+    def test_packed(self):
+        for fen in (KIWIPETE, "8/8/8/3pP3/4K3/8/8/7k w - d6 45 300"):
+            self._packed_walk(position.Position(fen), 1)
+        self.assertEqual(position.PACKED.size, 32)
+        self.assertRaises(ValueError, position.Position.from_bytes, 'x')
+
+    def test_debug_checks_key(self):
+        class DebugPosition(position.Position):
+            DEBUG = True
+
+        pos = DebugPosition(KIWIPETE)
+        pos.make_move(pos.pseudo_moves[0])
+        pos.key ^= 1
+        self.assertRaises(AssertionError, pos.make_move, pos.pseudo_moves[0])
+
+    def test_undo_without_64_bit_arrays(self):
+        # NOTE: platforms without a 64 bit array typecode get lists
+        typecode = bitboard.TYPECODE
+        bitboard.TYPECODE = None
+        try:
+            pos = position.Position(KIWIPETE)
+            self.assertTrue(isinstance(pos.undo, list))
+            self.assertEqual(pos.perft(2, hash_mb=1), 2039)
+            self.assertEqual(pos.copy().perft(2), 2039)
+        finally:
+            bitboard.TYPECODE = typecode
+
+    def test_slots_are_set(self):
+        pos = position.Position(KIWIPETE)
+        for copy in (pos, pos.copy(), position.Position.from_bytes(
+                pos.to_bytes()), position.Position.from_snapshot(
+                pos.snapshot())):
+            for name in position.Position.__slots__:
+                getattr(copy, name)
+            self.assertEqual(copy.perft_table, None)
+
+    def test_hashed_perft(self):
+        fen = "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"
+        pos = position.Position(fen)
+        self.assertEqual(pos.perft(4, hash_mb=1), 43238)
+        self.assertTrue(pos.perft_table.hits > 0)
+        self.assertTrue(0.0 < pos.perft_table.hit_rate < 1.0)
+        self.assertEqual(pos.fen, fen)
+
+    def test_castle_out_of_check(self):
+        pos = position.Position("r3k2r/8/8/8/4R3/8/8/4K3 b kq - 0 1")
+        self.assertEqual(pos.perft(1), 4)
+
+    def test_perft_divide(self):
+        pos = position.Position(KIWIPETE)
+        pos.zero_stats()
+        nodes = pos.perft(2)
+        stats = pos.stats
+        for workers in (1, 2):
+            counts = pos.perft_divide(2, workers=workers)
+            self.assertEqual(len(counts), 48)
+            self.assertEqual(sum(counts.values()), nodes)
+            self.assertEqual(pos.stats, stats)
+        pos = position.Position()
+        self.assertEqual(sum(pos.perft_divide(3, workers=2).values()), 8902)
+        self.assertEqual(pos.num_captures, 34)
+        self.assertEqual(pos.num_checks, 12)
+        self.assertEqual(pos.fen, position.Position().fen)
+
+
+class FenTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        for fen in ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                    "8/8/8/3pP3/4K3/8/8/7k w - d6 0 61",
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R "
+                    "b Kq - 3 12"):
+            pos = position.Position(fen)
+            self.assertEqual(pos.fen, fen)
+            pos.fen = fen
+            self.assertEqual(pos.fen, fen)
+
+    def test_errors(self):
+        pos = position.Position()
+        for fen in ("8/8/8/8/8/8/8 w - - 0 1",
+                    "9/8/8/8/8/8/8/8 w - - 0 1",
+                    "7x/8/8/8/8/8/8/8 w - - 0 1",
+                    "7pp/8/8/8/8/8/8/8 w - - 0 1",
+                    "7/8/8/8/8/8/8/8 w - - 0 1",
+                    "8/8/8/8/8/8/8/8 w - - x 1",
+                    "8/8/8/8/8/8/8/8 w -"):
+            self.assertRaises(ValueError, setattr, pos, 'fen', fen)
+
+
+class NotationTestCase(unittest.TestCase):
+
+    def _round_trip(self, pos, depth):
+        for mv in pos.legal_moves:
+            self.assertEqual(pos.parse_uci(move.uci(mv)), mv)
+            self.assertEqual(pos.parse_san(pos.san(mv)), mv)
+            if depth:
+                pos.make_move(mv)
+                self._round_trip(pos, depth - 1)
+                pos.unmake_move()
+
+    def test_round_trip(self):
+        for fen in (KIWIPETE, "7k/8/8/8/Q1Q5/8/Q7/K7 w - - 0 1",
+                    "4k3/1P6/8/3pP3/8/8/8/R3K2R w KQ d6 0 1"):
+            self._round_trip(position.Position(fen), 1)
+
+    def test_san(self):
+        pos = position.Position("7k/8/8/8/Q1Q5/8/Q7/K7 w - - 0 1")
+        moves = [move.str(mv) for mv in pos.annotated_moves]
+        for san in ('Qa4b3', 'Q2b3', 'Qcb3', 'Q4a3', 'Q2a3', 'Qcc2',
+                    'Qa8+', 'Qc8+'):
+            self.assertIn(san, moves)
+        self.assertEqual(pos.san(pos.parse_uci('a4b3')), 'Qa4b3')
+        pos = position.Position("4k3/1P6/8/3pP3/8/8/8/R3K2R w KQ d6 0 1")
+        self.assertEqual([pos.san(pos.parse_uci(uci))
+                          for uci in ('e5d6', 'b7b8q', 'b7b8n', 'e1g1')],
+                         ['exd6', 'b8=Q+', 'b8=N', 'O-O'])
+        self.assertEqual(move.uci(pos.parse_san('b8=R')), 'b7b8r')
+
+    def test_parse_san(self):
+        pos = position.Position("4k3/1P6/8/3pP3/8/8/8/R3K2R w KQ d6 0 1")
+        mv = pos.parse_san('exd6')
+        self.assertEqual(move.promotion(mv), piece.PAWN)
+        mv = pos.parse_san('b8=Q')
+        self.assertEqual(move.promotion(mv), piece.QUEEN)
+        mv = pos.parse_san('O-O')
+        self.assertEqual(move.tosq(mv), square.sq('g1'))
+        for san in ('b8', 'Nf3', 'zz', 'Kg2'):
+            self.assertRaises(ValueError, pos.parse_san, san)
+        pos = position.Position("4k3/8/8/8/8/8/K6R/R7 w - - 0 1")
+        self.assertRaises(ValueError, pos.parse_san, 'Rh1')
+        self.assertEqual(move.frsq(pos.parse_san('R1h1')), square.sq('a1'))
+        self.assertEqual(move.frsq(pos.parse_san('Rhh1')), square.sq('h2'))
+
+    def test_parse_uci(self):
+        pos = position.Position("4k3/1P6/8/3pP3/8/8/8/R3K2R w KQ d6 0 1")
+        for uci in ('e2e4', 'e5e7', 'b7b8', 'b7b8k', 'e1c2', 'a1a9', 'zz',
+                    'e5d6q', 'e1g1q', 'e8e7'):
+            self.assertRaises(ValueError, pos.parse_uci, uci)
+        self.assertEqual(pos.parse_uci('e1c1'),
+                         move.mv(piece.KING, square.sq('e1'),
+                                 square.sq('c1'), piece.KING))
@@ -0,0 +1,97 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from ivory import evaluate
+from ivory import move
+from ivory import position
+from ivory import search
+
+
+class SearchTestCase(unittest.TestCase):
+
+    def _search(self, fen, **kwargs):
+        pos = position.Position(fen)
+        result = search.Search(pos, hash_mb=1).search(**kwargs)
+        self.assertEqual(pos.fen, fen)
+        return result
+
+    def test_mate_in_one(self):
+        result = self._search("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", depth=3)
+        self.assertEqual(move.uci(result.move), 'a1a8')
+        self.assertEqual(result.score, search.MATE - 1)
+        self.assertEqual(result.depth, 1)
+
+    def test_mate_in_two(self):
+        result = self._search("7k/8/5K2/8/8/8/8/R7 w - - 0 1", depth=4)
+        self.assertEqual(result.score, search.MATE - 3)
+        self.assertEqual(len(result.pv), 3)
+
+    def test_wins_material(self):
+        result = self._search("4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1", depth=2)
+        self.assertEqual(move.uci(result.move), 'd2d5')
+        self.assertTrue(result.score > 400)
+
+    def test_quiescence_sees_recapture(self):
+        # NOTE: at depth one only quiescence sees exd5 after Qxd5
+        fen = "4k3/8/4p3/3p4/8/8/8/3QK3 w - - 0 1"
+        result = self._search(fen, depth=1)
+        self.assertNotEqual(move.uci(result.move), 'd1d5')
+        self.assertTrue(result.score > 500)
+        fen = "4k3/8/8/3p4/8/8/8/3QK3 w - - 0 1"
+        result = self._search(fen, depth=1)
+        self.assertEqual(move.uci(result.move), 'd1d5')
+
+    def test_stalemate(self):
+        result = self._search("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1", depth=2)
+        self.assertEqual(result.move, 0)
+        self.assertEqual(result.score, 0)
+
+    def test_quiesce_ply_cap_in_check(self):
+        # NOTE: Qb1 blocks the check with a cross-check, so quiescence
+        #       keeps searching evasions past the last ply
+        pos = position.Position("8/1k6/8/8/8/3Q4/8/K6r w - - 0 1")
+        searcher = search.Search(pos, hash_mb=1)
+        searcher.search(depth=1)
+        score = searcher._quiesce(-search.INFINITY, search.INFINITY,
+                                  search.MAX_PLY)
+        self.assertEqual(score, evaluate.evaluate(pos))
+        self.assertEqual(pos.fen, "8/1k6/8/8/8/3Q4/8/K6r w - - 0 1")
+
+    def test_limits(self):
+        fen = position.Position().fen
+        result = self._search(fen, nodes=500)
+        self.assertTrue(result.nodes <= 500)
+        self.assertTrue(result.move)
+        result = self._search(fen, depth=3)
+        self.assertEqual(result.depth, 3)
+        self.assertEqual(len(result.pv), 3)
+        result = self._search(fen, movetime=0.2)
+        self.assertTrue(result.time < 1.0)
+        self.assertTrue(result.move)
+
+    def test_pv_is_legal(self):
+        kiwipete = ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R "
+                    "w KQkq - 0 1")
+        result = self._search(kiwipete, depth=3)
+        pos = position.Position(kiwipete)
+        for mv in result.pv:
+            self.assertTrue(mv in pos.legal_moves)
+            pos.make_move(mv)
+        self.assertTrue(result.nps > 0)
+
@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import unittest
+
+from ivory import bitboard
+from ivory import move
+from ivory import movegen
+from ivory import piece
+from ivory import position
+from ivory import see
+from ivory import square
+
+
+class AttackersTestCase(unittest.TestCase):
+
+    def _squares(self, bb):
+        return sorted(square.str(sq) for sq in bitboard.squares(bb))
+
+    def test_attackers_of_both_colors(self):
+        pos = position.Position("4k3/8/3n4/5p2/3R4/3p4/8/1B2K3 w - - 0 1")
+        sq = square.sq('e4')
+        attackers = movegen.attackers_to(pos, sq, pos.occupied)
+        self.assertEqual(self._squares(attackers), ['d4', 'd6', 'f5'])
+        # NOTE: lifting the pawn on d3 opens the diagonal for the bishop
+        occupied = pos.occupied ^ square.BITS[square.sq('d3')]
+        attackers = movegen.attackers_to(pos, sq, occupied)
+        self.assertEqual(self._squares(attackers), ['b1', 'd4', 'd6', 'f5'])
+
+
+class SeeTestCase(unittest.TestCase):
+
+    def _see(self, fen, pc, frsq, tosq, promotion=piece.NONE):
+        pos = position.Position(fen)
+        mv = move.mv(pc, square.sq(frsq), square.sq(tosq), promotion)
+        self.assertTrue(mv in pos.legal_moves)
+        return see.see(pos, mv)
+
+    def test_undefended(self):
+        self.assertEqual(self._see("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 "
+                                   "w - - 0 1", piece.ROOK, 'e1', 'e5'),
+                         see.VALUES[piece.PAWN])
+
+    def test_xray_defender(self):
+        # NOTE: the queen behind the rook on d8 defends e5 through it
+        fen = "1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1"
+        self.assertEqual(self._see(fen, piece.KNIGHT, 'd3', 'e5'),
+                         see.VALUES[piece.PAWN] - see.VALUES[piece.KNIGHT])
+
+    def test_xray_attacker(self):
+        # NOTE: the rooks doubled on the e file win the pawn
+        fen = "4k3/8/3p4/4p3/8/8/4R3/4R1K1 w - - 0 1"
+        self.assertEqual(self._see(fen, piece.ROOK, 'e2', 'e5'),
+                         see.VALUES[piece.PAWN] - see.VALUES[piece.ROOK] +
+                         see.VALUES[piece.PAWN])
+
+    def test_equal_trade(self):
+        fen = "4k3/8/3p4/4n3/8/5N2/8/4K3 w - - 0 1"
+        self.assertEqual(self._see(fen, piece.KNIGHT, 'f3', 'e5'),
+                         see.VALUES[piece.KNIGHT] - see.VALUES[piece.KNIGHT])
+
+    def test_king_cannot_recapture_defended(self):
+        fen = "8/8/8/3k4/4p3/8/4Q3/4R1K1 w - - 0 1"
+        self.assertEqual(self._see(fen, piece.QUEEN, 'e2', 'e4'),
+                         see.VALUES[piece.PAWN])
+
+    def test_en_passant_and_promotion(self):
+        fen = "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1"
+        self.assertEqual(self._see(fen, piece.PAWN, 'e5', 'd6', piece.PAWN),
+                         see.VALUES[piece.PAWN])
+        fen = "3rk3/4P3/8/8/8/8/8/4K3 w - - 0 1"
+        self.assertEqual(self._see(fen, piece.PAWN, 'e7', 'd8', piece.QUEEN),
+                         see.VALUES[piece.ROOK] + see.VALUES[piece.QUEEN] -
+                         see.VALUES[piece.PAWN] - see.VALUES[piece.QUEEN])
@@ -0,0 +1,96 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ivory import position
+from ivory import store
+
+
+KIWIPETE = ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R "
+            "w KQkq - 0 1")
+
+
+class StoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'positions.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _positions(self):
+        pos = position.Position(KIWIPETE)
+        out = [pos.copy()]
+        for mv in pos.legal_moves:
+            pos.make_move(mv)
+            out.append(pos.copy())
+            for reply in pos.legal_moves[:5]:
+                pos.make_move(reply)
+                out.append(pos.copy())
+                pos.unmake_move()
+            pos.unmake_move()
+        return out
+
+    def test_write_and_lookup(self):
+        positions = self._positions()
+        # NOTE: every position is written twice, and only kept once
+        count = store.write(self.path, positions + positions[::-1])
+        keys = set(pos.key for pos in positions)
+        self.assertEqual(count, len(keys))
+        self.assertEqual(os.path.getsize(self.path),
+                         store.HEADER.size + count * store.RECORD.size)
+        with store.PositionFile(self.path) as stored:
+            self.assertEqual(len(stored), count)
+            self.assertEqual([key for key, data in stored], sorted(keys))
+            for pos in positions:
+                self.assertTrue(pos.key in stored)
+                self.assertEqual(stored.get(pos.key), pos.to_bytes())
+                self.assertEqual(stored.position(pos.key).fen, pos.fen)
+            self.assertFalse(0 in stored)
+            self.assertEqual(stored.get(1), None)
+            self.assertRaises(KeyError, stored.position, 1)
+
+    def test_first_duplicate_kept(self):
+        pairs = [(key % 7, chr(i) * position.PACKED.size)
+                 for i, key in enumerate(xrange(20, 0, -1))]
+        first = {}
+        for key, data in pairs:
+            first.setdefault(key, data)
+        expected = sorted(first.items())
+        self.assertEqual(store.encode(pairs), expected)
+        # NOTE: small chunks spill runs with duplicates across them
+        for chunk_records, merge_runs in ((3, 64), (7, 64), (100, 64),
+                                          (1, 2), (2, 3)):
+            self.assertEqual(store.write(self.path, pairs, chunk_records,
+                                         merge_runs), 7)
+            with store.PositionFile(self.path) as stored:
+                self.assertEqual(list(stored), expected)
+            self.assertEqual(os.listdir(self.dir), ['positions.bin'])
+
+    def test_bad_files(self):
+        store.write(self.path, self._positions()[:3])
+        with open(self.path, 'r+b') as f:
+            f.truncate(store.HEADER.size + store.RECORD.size)
+        self.assertRaises(ValueError, store.PositionFile, self.path)
+        with open(self.path, 'wb') as f:
+            f.write('not a position file at all')
+        self.assertRaises(ValueError, store.PositionFile, self.path)
@@ -0,0 +1,132 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright 2012 Vishvananda Ishaya
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import StringIO
+import time
+import unittest
+
+from ivory import uci
+
+
+class BudgetTestCase(unittest.TestCase):
+
+    def test_budget(self):
+        self.assertAlmostEqual(uci.budget(60000), 2.0)
+        self.assertAlmostEqual(uci.budget(60000, 1000, 10), 6.75)
+        self.assertAlmostEqual(uci.budget(100, 5000), 0.1 - uci.OVERHEAD)
+        self.assertEqual(uci.budget(0), uci.MIN_TIME)
+
+
+class EngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.out = StringIO.StringIO()
+        self.engine = uci.Engine(self.out, hash_mb=1)
+
+    def tearDown(self):
+        self.engine.handle('quit')
+
+    def _lines(self):
+        return self.out.getvalue().splitlines()
+
+    def _wait_for(self, prefix, timeout=5.0):
+        end = time.time() + timeout
+        while time.time() < end:
+            lines = [line for line in self._lines()
+                     if line.startswith(prefix)]
+            if lines:
+                return lines[-1]
+            time.sleep(0.01)
+        self.fail('no %s line in %r' % (prefix, self._lines()))
+
+    def test_handshake(self):
+        self.engine.handle('uci')
+        self.engine.handle('isready')
+        self.engine.handle('bogus')
+        self.assertEqual(self._lines()[-3:], ['uciok', 'readyok',
+                                              'info string unknown '
+                                              'command bogus'])
+        self.assertTrue(self.engine.handle('setoption name Hash value 2'))
+        self.assertFalse(self.engine.handle('quit'))
+
+    def test_position(self):
+        self.engine.handle('position startpos moves e2e4 e7e5 g1f3')
+        self.assertEqual(self.engine.pos.fen, "rnbqkbnr/pppp1ppp/8/4p3/4P3/"
+                         "5N2/PPPP1PPP/RNBQKB1R b KQkq - 1 2")
+        self.engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+        self.assertEqual(self.engine.pos.fen,
+                         "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        self.engine.handle('position startpos moves e2e5')
+        self.assertTrue(self._lines()[-1].startswith('info string bad'))
+
+    def test_bad_position_keeps_previous(self):
+        fen = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+        self.engine.handle('position fen %s' % fen)
+        for line in ('position startpos moves e2e4 e7e5 e1e3',
+                     'position startpos moves e2e4 zz',
+                     'position fen 8/8/8 w - - 0 1',
+                     'position nothing'):
+            self.engine.handle(line)
+            self.assertTrue(self._lines()[-1].startswith('info string bad'))
+            self.assertEqual(self.engine.pos.fen, fen)
+        self.engine.handle('go depth 1')
+        self.assertEqual(self._wait_for('bestmove'), 'bestmove a1a8')
+
+    def test_go_depth(self):
+        self.engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+        self.engine.handle('go depth 3')
+        self.assertEqual(self._wait_for('bestmove'), 'bestmove a1a8')
+        self.assertTrue(self._wait_for('info depth 1').endswith('pv a1a8'))
+
+    def test_infinite_waits_for_stop(self):
+        # NOTE: mate is found at once, but bestmove is held until stop
+        self.engine.handle('position fen 6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+        self.engine.handle('go infinite')
+        self._wait_for('info depth 1')
+        self.engine.handle('isready')
+        self._wait_for('readyok')
+        self.assertFalse([line for line in self._lines()
+                          if line.startswith('bestmove')])
+        self.engine.handle('stop')
+        self.assertEqual(self._wait_for('bestmove'), 'bestmove a1a8')
+
+    def test_stop_is_prompt(self):
+        self.engine.handle('position startpos')
+        self.engine.handle('go infinite')
+        time.sleep(0.2)
+        start = time.time()
+        self.engine.handle('stop')
+        self._wait_for('bestmove')
+        self.assertTrue(time.time() - start < 0.5)
+
+    def test_ponderhit(self):
+        self.engine.handle('position startpos')
+        self.engine.handle('go ponder wtime 3000 btime 3000')
+        time.sleep(0.2)
+        self.assertFalse([line for line in self._lines()
+                          if line.startswith('bestmove')])
+        start = time.time()
+        self.engine.handle('ponderhit')
+        self._wait_for('bestmove')
+        self.assertTrue(time.time() - start < uci.budget(3000) + 0.5)
+
+    def test_movetime(self):
+        self.engine.handle('position startpos')
+        start = time.time()
+        self.engine.handle('go movetime 300')
+        self._wait_for('bestmove')
+        self.assertTrue(time.time() - start < 0.6)